@@ -0,0 +1,346 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from .utils import FileLock, cache_path
+
+DEFAULT_MAX_SIZE = 2 * 1024**3
+DEFAULT_MAX_AGE = 10 * 60
+# Quantos bytes acumular antes de liberar novos dados para quem lê o arquivo parcial
+ANNOUNCE_SIZE = 1024**2
+
+
+class CacheWriter:
+    """Download parcial dentro do cache que calcula o SHA-256 enquanto é escrito.
+
+    O arquivo parcial tem um nome fixo por URL e sobrevive a falhas e
+    cancelamentos, junto com o `ETag`/`Last-Modified` da resposta original. Assim
+    a próxima tentativa pode continuar de onde parou com uma requisição `Range`.
+    Enquanto está aberto, o arquivo parcial fica travado: outro download da mesma URL,
+    mesmo de outro processo, espera este terminar.
+    """
+
+    def __init__(self, cache, url, on_wait=None):
+        self.cache = cache
+        self.url = url
+        # Recebe `advance(bytes_disponíveis)` e `reset()` conforme o arquivo cresce
+        self.watcher = None
+        self.announced = 0
+
+        partial_dir = os.path.join(cache.cache_dir, "partial")
+        os.makedirs(partial_dir, exist_ok=True)
+
+        self.temp_path = os.path.join(partial_dir, hashlib.sha1(url.encode()).hexdigest() + ".part")
+        self.meta_path = self.temp_path + ".json"
+        self.lock = FileLock(self.temp_path + ".lock")
+
+        # `on_wait()` avisa que outro download da mesma URL está em andamento
+        if not self.lock.acquire(blocking=False) and on_wait is not None:
+            on_wait()
+
+        self.lock.acquire()
+
+        try:
+            self.meta = self.load_meta()
+
+            open(self.temp_path, "ab").close()
+            self.file = open(self.temp_path, "r+b")
+            self.hash = hashlib.sha256()
+            self.size = 0
+
+            if self.validator is None:
+                self.restart()
+            elif "segments" not in self.meta:
+                # Recalcula o hash da parte já baixada para poder continuar a partir dela
+                while chunk := self.file.read(1024**2):
+                    self.hash.update(chunk)
+                    self.size += len(chunk)
+        except BaseException:
+            self.lock.release()
+            raise
+
+    def load_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save_meta(self):
+        with open(self.meta_path, "w", encoding="utf-8") as file:
+            json.dump(self.meta, file)
+
+    @property
+    def validator(self):
+        return self.meta.get("etag") or self.meta.get("last_modified")
+
+    @property
+    def expected_size(self):
+        return self.meta.get("size") or 0
+
+    def resume_headers(self):
+        if self.size == 0 or self.validator is None or "segments" in self.meta:
+            return {}
+
+        return {"Range": f"bytes={self.size}-", "If-Range": self.validator}
+
+    def restart(self, etag=None, last_modified=None, size=0):
+        """Descarta a parte já baixada e começa um novo download do zero."""
+        self.file.seek(0)
+        self.file.truncate()
+        self.hash = hashlib.sha256()
+        self.size = 0
+        self.announced = 0
+        self.meta = {"etag": etag, "last_modified": last_modified, "size": size}
+        self.save_meta()
+
+        if self.watcher is not None:
+            self.watcher.reset()
+
+    def plan_segments(self, size, etag, last_modified, count):
+        """Prepara o arquivo parcial para um download segmentado de `size` bytes.
+
+        Faixas de uma tentativa anterior do mesmo conteúdo são reaproveitadas. Cada
+        faixa é uma lista `[início, fim, bytes_baixados]`.
+        """
+        same_content = (etag or last_modified) == self.validator and self.expected_size == size
+
+        if not (same_content and self.meta.get("segments")):
+            # Um download sequencial interrompido do mesmo conteúdo vira o início das faixas
+            prefix = self.size if same_content else 0
+
+            if not same_content:
+                self.restart(etag, last_modified, size)
+
+            self.file.truncate(size)
+            self.meta["size"] = size
+
+            step = max(-(-size // count), 1)
+            self.meta["segments"] = [
+                [start, min(start + step, size) - 1, min(max(prefix - start, 0), min(step, size - start))]
+                for start in range(0, size, step)
+            ]
+            self.save_meta()
+
+        return self.meta["segments"]
+
+    def finish_segments(self):
+        """Calcula o SHA-256 do arquivo montado pelas faixas e o marca como completo."""
+        self.meta.pop("segments", None)
+        self.save_meta()
+
+        self.file.seek(0)
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+        while chunk := self.file.read(1024**2):
+            self.hash.update(chunk)
+            self.size += len(chunk)
+
+    def write(self, data):
+        self.file.write(data)
+        self.hash.update(data)
+        self.size += len(data)
+
+        if self.watcher is not None and self.size - self.announced >= ANNOUNCE_SIZE:
+            self.announce(self.size)
+
+    def announce(self, available):
+        self.file.flush()
+        self.announced = available
+
+        if self.watcher is not None:
+            self.watcher.advance(available)
+
+    def commit(self):
+        self.file.close()
+        path = self.cache.store(
+            self.temp_path,
+            self.hash.hexdigest(),
+            self.size,
+            self.url,
+            self.meta.get("etag"),
+            self.meta.get("last_modified"),
+        )
+
+        if os.path.exists(self.meta_path):
+            os.remove(self.meta_path)
+
+        return path
+
+    def discard(self):
+        self.file.close()
+
+        for path in (self.temp_path, self.meta_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # O arquivo parcial é mantido em caso de erro para ser retomado depois
+        self.file.close()
+        self.lock.release()
+
+
+class ArchiveCache:
+    """Cache persistente de arquivos baixados, endereçado pelo SHA-256 do conteúdo.
+
+    O índice associa cada URL ao último conteúdo recebido junto com o `ETag` e o
+    `Last-Modified` da resposta, o que permite revalidar com uma requisição
+    condicional. Quando o tamanho total passa de `max_size`, os objetos usados há
+    mais tempo são removidos primeiro.
+
+    Vários processos (a janela, a linha de comando e o serviço) usam o mesmo cache,
+    então o índice é relido antes de cada consulta e alterado só com `index.lock`
+    travado, em vez de sobrescrito com uma cópia antiga guardada na memória.
+    """
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir or cache_path()
+        self.max_size = max_size
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.index_lock = FileLock(os.path.join(self.cache_dir, "index.lock"))
+
+        os.makedirs(os.path.join(self.cache_dir, "objects"), exist_ok=True)
+        self.index = self.load_index()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, "index.json")
+
+    def load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            index = {}
+
+        index.setdefault("urls", {})
+        index.setdefault("objects", {})
+        return index
+
+    def save_index(self):
+        temp_path = self.index_path + ".tmp"
+
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.index, file, indent=1, sort_keys=True)
+
+        os.replace(temp_path, self.index_path)
+
+    @contextmanager
+    def update(self):
+        """Relê o índice com ele travado entre processos e o grava de volta ao sair."""
+        with self.lock, self.index_lock:
+            self.index = self.load_index()
+            yield self.index
+            self.save_index()
+
+    def object_path(self, digest):
+        return os.path.join(self.cache_dir, "objects", digest[:2], digest)
+
+    def lookup(self, url):
+        """Retorna a entrada do índice para `url` se o objeto ainda estiver no disco."""
+        with self.lock, self.index_lock:
+            self.index = self.load_index()
+            entry = self.index["urls"].get(url)
+
+            if entry is None or not os.path.exists(self.object_path(entry["sha256"])):
+                return None
+
+            return dict(entry)
+
+    def urls(self, prefix=""):
+        """Retorna as URLs começadas por `prefix` cujo objeto ainda está no disco."""
+        with self.lock, self.index_lock:
+            self.index = self.load_index()
+            return [
+                url
+                for url, entry in self.index["urls"].items()
+                if url.startswith(prefix) and os.path.exists(self.object_path(entry["sha256"]))
+            ]
+
+    def is_fresh(self, entry):
+        return time.time() - entry.get("checked", 0) < self.max_age
+
+    def conditional_headers(self, entry):
+        headers = {}
+
+        if entry is None:
+            return headers
+
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        return headers
+
+    def open_writer(self, url, on_wait=None):
+        return CacheWriter(self, url, on_wait)
+
+    def store(self, temp_path, digest, size, url, etag=None, last_modified=None):
+        path = self.object_path(digest)
+
+        with self.update():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+
+            now = time.time()
+            self.index["objects"][digest] = {"size": size, "accessed": now}
+            self.index["urls"][url] = {
+                "sha256": digest,
+                "etag": etag,
+                "last_modified": last_modified,
+                "checked": now,
+            }
+
+            self.evict(keep=digest)
+
+        return path
+
+    def touch(self, url, revalidated=False):
+        """Marca o objeto de `url` como usado agora e retorna seu caminho."""
+        with self.update():
+            entry = self.index["urls"][url]
+            now = time.time()
+
+            if revalidated:
+                entry["checked"] = now
+
+            self.index["objects"].setdefault(entry["sha256"], {"size": 0})["accessed"] = now
+
+            return self.object_path(entry["sha256"])
+
+    def evict(self, keep=None):
+        """Remove os objetos menos usados até o cache caber em `max_size`. Chamado dentro de `update`."""
+        objects = self.index["objects"]
+        objects_dir = os.path.join(self.cache_dir, "objects")
+
+        # Objetos sem entrada no índice, perdidos quando um processo sobrescrevia o índice de outro
+        for prefix in os.listdir(objects_dir):
+            for digest in os.listdir(os.path.join(objects_dir, prefix)):
+                if digest not in objects:
+                    os.remove(os.path.join(objects_dir, prefix, digest))
+
+        total = sum(info["size"] for info in objects.values())
+
+        for digest in sorted(objects, key=lambda digest: objects[digest]["accessed"]):
+            if total <= self.max_size:
+                break
+            if digest == keep:
+                continue
+
+            total -= objects.pop(digest)["size"]
+            path = self.object_path(digest)
+
+            if os.path.exists(path):
+                os.remove(path)
+
+        self.index["urls"] = {
+            url: entry for url, entry in self.index["urls"].items() if entry["sha256"] in objects
+        }
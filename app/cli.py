@@ -0,0 +1,181 @@
+import argparse
+import threading
+from .installer import PRESETS, SHADERS, SHADER_PRESETS, Installer
+from .service import INTERVAL, UpdateService
+from .staging import StagedInstall
+from .store import ModStore
+from .telemetry import main as telemetry_main
+from .utils import default_path
+
+
+def parse_target(value, args):
+    """Interpreta `DIRETÓRIO[=PREDEFINIÇÃO]` usando as opções globais como padrão."""
+    dest_dir, _, preset = value.rpartition("=") if "=" in value else (value, "", "")
+
+    if preset and preset not in PRESETS:
+        raise argparse.ArgumentTypeError(f"Predefinição inválida para {dest_dir}: {preset}")
+
+    return {
+        "dest_dir": dest_dir,
+        "preset": preset or args.preset,
+        "shader": args.shader,
+        "shader_preset": args.shader_preset,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="modpack_updater",
+        description="Instala ou atualiza o modpack Última Esperança sem interface gráfica.",
+    )
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        metavar="DIRETÓRIO[=PREDEFINIÇÃO]",
+        help=f"diretórios do Minecraft (padrão: {default_path()})",
+    )
+    parser.add_argument("--preset", choices=PRESETS, default=PRESETS[0], help="predefinição de performance")
+    parser.add_argument("--shader", choices=SHADERS, default=SHADERS[-1], help="shader a habilitar")
+    parser.add_argument(
+        "--shader-preset", choices=SHADER_PRESETS, default=SHADER_PRESETS[1], help="qualidade do shader"
+    )
+    parser.add_argument("--connections", type=int, default=4, help="conexões simultâneas no download")
+    parser.add_argument(
+        "--mirror", action="append", default=[], metavar="URL", help="espelho adicional do arquivo do modpack"
+    )
+    parser.add_argument("--workers", type=int, help="instalações simultâneas (padrão: uma por diretório)")
+    parser.add_argument(
+        "--force", action="store_true", help="reinstala mesmo que o modpack já esteja atualizado"
+    )
+    parser.add_argument(
+        "--rollback", action="store_true", help="restaura a instalação anterior em vez de atualizar"
+    )
+    parser.add_argument(
+        "--repair", action="store_true", help="verifica os arquivos instalados e restaura só os danificados"
+    )
+    parser.add_argument(
+        "--full", action="store_true", help="com --repair, lê todos os arquivos, mesmo os que parecem intactos"
+    )
+    parser.add_argument(
+        "--no-store", action="store_true", help="não compartilha os mods com outros perfis pela loja local"
+    )
+    parser.add_argument(
+        "--gc", action="store_true", help="remove da loja local os mods que nenhum perfil usa mais"
+    )
+    parser.add_argument(
+        "--profile", action="store_true", help="grava um perfil de CPU (cProfile) e de memória (tracemalloc)"
+    )
+    parser.add_argument(
+        "--report", action="store_true", help="resume as etapas mais lentas das execuções registradas"
+    )
+    parser.add_argument(
+        "--service",
+        action="store_true",
+        help="fica em segundo plano baixando novas revisões e as instala quando o jogo estiver fechado",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=INTERVAL / 60,
+        metavar="MINUTOS",
+        help="com --service, tempo entre verificações",
+    )
+    parser.add_argument(
+        "--limit", type=float, metavar="KB/s", help="com --service, limite de banda dos downloads em segundo plano"
+    )
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        targets = [parse_target(value, args) for value in args.targets or [default_path()]]
+    except argparse.ArgumentTypeError as error:
+        parser.error(str(error))
+
+    if args.report:
+        return telemetry_main(["report"])
+
+    if args.gc:
+        removed, freed = ModStore().collect()
+        print(f"Loja: {removed} arquivos removidos, {freed / 1024**2:.1f} MB liberados")
+        return 0
+
+    if args.rollback:
+        failed = False
+
+        for target in targets:
+            try:
+                StagedInstall(target["dest_dir"]).rollback()
+                print(f"{target['dest_dir']}: instalação anterior restaurada")
+            except OSError as error:
+                print(f"{target['dest_dir']}: falhou: {error}")
+                failed = True
+
+        return 1 if failed else 0
+
+    lock = threading.Lock()
+    last_steps = {}
+
+    def on_progress(step, status):
+        # Uma linha por ponto percentual, por alvo, para não inundar o terminal
+        key = status.split(": ", 1)[0] if ": " in status else ""
+
+        with lock:
+            if int(step) != last_steps.get(key):
+                last_steps[key] = int(step)
+                print(f"[{int(step):3d}%] {status}", flush=True)
+
+    installer = Installer(on_progress)
+    installer.connections = args.connections
+    installer.mirrors += args.mirror
+
+    installer.telemetry.profile = installer.telemetry.profile or args.profile
+
+    if args.no_store:
+        installer.store = None
+
+    if args.service:
+        service = UpdateService(installer, targets, args.interval * 60, args.limit * 1024 if args.limit else None)
+
+        def on_result(results):
+            for dest_dir, status in results.items():
+                print(f"{dest_dir}: {status if isinstance(status, str) else f'falhou: {status}'}", flush=True)
+
+        try:
+            service.run(on_result)
+        except KeyboardInterrupt:
+            service.stop()
+
+        return 0
+
+    if args.repair:
+        failed = False
+
+        for target in targets:
+            try:
+                repaired = installer.repair(
+                    target["dest_dir"], target["preset"], target["shader"], target["shader_preset"], args.full
+                )
+                print(f"{target['dest_dir']}: {len(repaired)} arquivos restaurados")
+
+                for name in repaired:
+                    print(f"  {name}")
+            except Exception as error:
+                print(f"{target['dest_dir']}: falhou: {error}")
+                failed = True
+
+        return 1 if failed else 0
+
+    try:
+        results = installer.install_many(targets, args.workers, args.force)
+    except Exception as error:
+        print(f"Falhou: {error}")
+        return 1
+
+    for dest_dir, error in results.items():
+        print(f"{dest_dir}: {'concluído' if error is None else f'falhou: {error}'}")
+
+    return 0 if all(error is None for error in results.values()) else 1
@@ -0,0 +1,202 @@
+import os
+import json
+from .utils import resource_path
+
+PRESETS_PATH = "app/assets/presets.json"
+GROUPS = ["base", "preset", "shader", "shader_preset"]
+# Arquivos fora de qualquer componente declarado são sempre instalados
+CORE_COMPONENT = "core"
+
+
+def load_presets(path=None):
+    with open(path or resource_path(PRESETS_PATH), "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+# As opções oferecidas vêm do arquivo de predefinições, para que uma nova não exija código
+PRESET_DATA = load_presets()
+PRESETS = list(PRESET_DATA["preset"])
+SHADERS = list(PRESET_DATA["shader"])
+SHADER_PRESETS = list(PRESET_DATA["shader_preset"])
+
+
+class ConfigFile:
+    """Arquivo `chave<separador>valor` lido uma única vez para um mapa ordenado.
+
+    Comentários e linhas que não seguem o formato são mantidos no lugar. Chaves
+    ausentes recebem uma linha nova no fim, e o arquivo só é regravado se algum
+    valor mudou de fato.
+    """
+
+    def __init__(self, path, separator, lines=None, newline="\n"):
+        self.path = path
+        self.separator = separator
+        # Cada linha é `[chave, valor]` ou `[None, texto_original]`
+        self.lines = lines if lines is not None else []
+        self.index = {line[0]: position for position, line in enumerate(self.lines) if line[0] is not None}
+        self.newline = newline
+        self.changed = False
+
+    @classmethod
+    def load(cls, path, separator):
+        try:
+            with open(path, "r", encoding="utf-8", newline="") as file:
+                content = file.read()
+        except FileNotFoundError:
+            return cls(path, separator)
+
+        lines = []
+
+        for line in content.splitlines():
+            key, found, value = line.partition(separator)
+
+            if found and key and not key.lstrip().startswith("#"):
+                lines.append([key, value])
+            else:
+                lines.append([None, line])
+
+        return cls(path, separator, lines, "\r\n" if "\r\n" in content else "\n")
+
+    def get(self, key, default=None):
+        position = self.index.get(key)
+        return self.lines[position][1] if position is not None else default
+
+    def apply(self, values):
+        """Aplica `values` (chave -> valor, ou None para remover) e informa se algo mudou."""
+        for key, value in values.items():
+            position = self.index.get(key)
+
+            if value is None:
+                if position is not None:
+                    self.lines[position] = [None, None]
+                    del self.index[key]
+                    self.changed = True
+            elif position is None:
+                self.index[key] = len(self.lines)
+                self.lines.append([key, value])
+                self.changed = True
+            elif self.lines[position][1] != value:
+                self.lines[position][1] = value
+                self.changed = True
+
+        return self.changed
+
+    def dumps(self):
+        lines = [f"{key}{self.separator}{value}" if key is not None else value for key, value in self.lines]
+        lines = [line for line in lines if line is not None]
+        return self.newline.join(lines) + self.newline if lines else ""
+
+    def save(self):
+        if not self.changed:
+            return False
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+
+        with open(temp_path, "w", encoding="utf-8", newline="") as file:
+            file.write(self.dumps())
+
+        os.replace(temp_path, self.path)
+        self.changed = False
+        return True
+
+
+def resolve(presets, preset, shader, shader_preset):
+    """Junta os grupos escolhidos em um único mapa `arquivo -> valores` (None remove o arquivo)."""
+    choices = {"base": None, "preset": preset, "shader": shader, "shader_preset": shader_preset}
+    files = {}
+
+    for group in GROUPS:
+        section = presets.get(group, {})
+        patch = section if choices[group] is None else section.get(choices[group], {})
+
+        for name, values in patch.items():
+            if values is None:
+                files[name] = None
+            else:
+                files[name] = {**(files.get(name) or {}), **values}
+
+    return files
+
+
+def apply_presets(dest_dir, preset, shader, shader_preset, presets=None, on_file=None):
+    """Aplica as predefinições escolhidas aos arquivos de configuração em `dest_dir`.
+
+    Retorna a lista de arquivos alterados. `on_file(índice, total, nome)` é chamado
+    antes de cada arquivo, para relatar progresso.
+    """
+    presets = presets if presets is not None else PRESET_DATA
+    files = resolve(presets, preset, shader, shader_preset)
+    changed = []
+
+    for position, (name, values) in enumerate(files.items()):
+        if on_file is not None:
+            on_file(position, len(files), name)
+
+        settings = presets.get("files", {}).get(name, {})
+        path = os.path.join(dest_dir, *name.split("/"))
+
+        if values is None:
+            if os.path.exists(path):
+                os.remove(path)
+                changed.append(name)
+            continue
+
+        separator = settings.get("separator", "=")
+
+        if settings.get("replace"):
+            # O arquivo inteiro pertence à predefinição: só interessa o que ela define
+            config = ConfigFile(path, separator)
+            config.apply(values)
+            config.changed = not os.path.exists(path) or config.dumps() != ConfigFile.load(path, separator).dumps()
+        else:
+            config = ConfigFile.load(path, separator)
+            config.apply(values)
+
+        if config.save():
+            changed.append(name)
+
+    return changed
+
+
+def all_components(presets=None):
+    presets = presets if presets is not None else PRESET_DATA
+    return {CORE_COMPONENT, *presets.get("components", {})}
+
+
+def select_components(preset, shader, shader_preset, presets=None):
+    """Retorna os componentes do modpack que as escolhas exigem.
+
+    Um componente com `when` (grupo -> opções) só entra se alguma das opções foi
+    escolhida no grupo; sem `when`, entra sempre.
+    """
+    presets = presets if presets is not None else PRESET_DATA
+    choices = {"preset": preset, "shader": shader, "shader_preset": shader_preset}
+    selected = {CORE_COMPONENT}
+
+    for name, component in presets.get("components", {}).items():
+        when = component.get("when")
+
+        if when is None or any(choices.get(group) in options for group, options in when.items()):
+            selected.add(name)
+
+    return selected
+
+
+def component_of(name, presets=None):
+    """Retorna o componente do arquivo `name` (caminho relativo ao diretório do Minecraft)."""
+    presets = presets if presets is not None else PRESET_DATA
+
+    for component, settings in presets.get("components", {}).items():
+        if name.startswith(tuple(settings["paths"])):
+            return component
+
+    return CORE_COMPONENT
+
+
+def component_filter(selected, presets=None):
+    """Retorna `wanted(caminho)` para os arquivos de `selected`, ou None se nada fica de fora."""
+    if all_components(presets) <= set(selected):
+        return None
+
+    return lambda name: component_of(name, presets) in selected
@@ -0,0 +1,388 @@
+import os
+import zlib
+import struct
+import hashlib
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+LOCAL_SIGNATURE = b"PK\x03\x04"
+DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+END_SIGNATURES = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x06\x06")
+CHUNK_SIZE = 256 * 1024
+EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+class StreamUnsupported(Exception):
+    pass
+
+
+def is_safe_relative(name):
+    """Retorna True se `name` é um caminho relativo que não sai do diretório do Minecraft."""
+    parts = name.replace("\\", "/").split("/")
+    # `C:` e `C:pasta` são relativos para o `os.path` no Linux, mas não no Windows
+    return not os.path.isabs(name) and not name.startswith(("/", "\\")) and ":" not in parts[0] and ".." not in parts
+
+
+def member_destination(member):
+    """Retorna o caminho relativo do membro, sem a pasta raiz do ZIP do codeload."""
+    relative = member.split("/", 1)[-1]
+
+    if not is_safe_relative(member) or not is_safe_relative(relative):
+        raise ValueError(f"Caminho inseguro detectado no ZIP: {member}")
+
+    return relative
+
+
+class StreamingExtractor(threading.Thread):
+    """Extrai os membros do ZIP enquanto o arquivo ainda está sendo baixado.
+
+    O arquivo parcial é lido pelos cabeçalhos locais, na ordem em que os bytes
+    chegam, e cada membro alterado é gravado no destino (ou ligado a partir da
+    `store`, quando ela já o tem) e registrado no manifesto.
+    O que não puder ser extraído assim (Zip64, membros sem tamanho conhecido que
+    não usam deflate, dados fora de ordem) apenas interrompe o streaming: a
+    extração normal depois do download termina o trabalho e pula o que já foi
+    gravado.
+    """
+
+    def __init__(self, path, manifest, store=None, wanted=None):
+        super().__init__(daemon=True)
+        self.path = path
+        self.manifest = manifest
+        self.store = store
+        # Membros de componentes não escolhidos são pulados
+        self.wanted = wanted
+        self.condition = threading.Condition()
+        self.available = 0
+        self.position = 0
+        self.finished = False
+        self.aborted = False
+        self.complete = False
+        self.error = None
+
+    def advance(self, available):
+        with self.condition:
+            self.available = max(self.available, available)
+            self.condition.notify_all()
+
+    def reset(self):
+        with self.condition:
+            # Bytes já consumidos deixaram de valer; continuar só é seguro do zero
+            if self.position > 0:
+                self.aborted = True
+            self.available = 0
+            self.condition.notify_all()
+
+    def finish(self):
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def abort(self):
+        with self.condition:
+            self.aborted = True
+            self.condition.notify_all()
+
+    def wait_for(self, end):
+        with self.condition:
+            while self.available < end and not self.finished and not self.aborted:
+                self.condition.wait()
+
+            if self.aborted:
+                raise StreamUnsupported("Extração em streaming interrompida")
+
+            return self.available
+
+    def read(self, file, size):
+        if self.wait_for(self.position + size) < self.position + size:
+            raise EOFError("Arquivo do modpack truncado")
+
+        data = file.read(size)
+        self.position += len(data)
+        return data
+
+    def read_some(self, file, size):
+        available = self.wait_for(self.position + 1)
+        size = min(size, available - self.position)
+
+        if size <= 0:
+            raise EOFError("Arquivo do modpack truncado")
+
+        return self.read(file, size)
+
+    def unread(self, file, size):
+        file.seek(-size, os.SEEK_CUR)
+        self.position -= size
+
+    def run(self):
+        try:
+            # Sem buffer: o arquivo cresce enquanto é lido e não pode haver leitura antecipada
+            with open(self.path, "rb", buffering=0) as file:
+                self.extract(file)
+            self.complete = True
+        except Exception as error:
+            self.error = error
+
+    def extract(self, file):
+        dest_dir = self.manifest.dest_dir
+
+        while True:
+            signature = self.read(file, 4)
+
+            if signature in END_SIGNATURES:
+                return
+            if signature != LOCAL_SIGNATURE:
+                raise StreamUnsupported("Cabeçalho local esperado")
+
+            header = LOCAL_HEADER.unpack(signature + self.read(file, LOCAL_HEADER.size - 4))
+            _, _, flags, method, _, _, crc, compressed_size, size, name_length, extra_length = header
+            name = self.read(file, name_length).decode("utf-8" if flags & 0x800 else "cp437")
+            extra = self.read(file, extra_length)
+
+            has_descriptor = bool(flags & 0x08)
+
+            if flags & 0x01:
+                raise StreamUnsupported(f"Membro criptografado: {name}")
+            if 0xFFFFFFFF in (compressed_size, size) or has_zip64_extra(extra):
+                raise StreamUnsupported(f"Membro Zip64: {name}")
+            if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+                raise StreamUnsupported(f"Compressão não suportada: {name}")
+            if has_descriptor and method != zipfile.ZIP_DEFLATED:
+                raise StreamUnsupported(f"Tamanho desconhecido: {name}")
+
+            member_path = member_destination(name)
+
+            if name.endswith("/") or not member_path:
+                if member_path:
+                    os.makedirs(os.path.join(dest_dir, member_path), exist_ok=True)
+                self.skip(file, method, compressed_size, has_descriptor)
+                continue
+
+            if (self.wanted is not None and not self.wanted(member_path)) or (
+                not has_descriptor and self.manifest.is_current(member_path, crc, size)
+            ):
+                self.skip(file, method, compressed_size, has_descriptor)
+                continue
+
+            if not has_descriptor and self.store is not None:
+                destination = self.manifest.local_path(member_path)
+                os.makedirs(os.path.dirname(destination), exist_ok=True)
+                sha256 = self.store.place(member_path, crc, size, destination)
+
+                if sha256 is not None:
+                    self.manifest.record(member_path, crc, size, sha256)
+                    self.skip(file, method, compressed_size, has_descriptor)
+                    continue
+
+            self.extract_member(file, member_path, method, crc, compressed_size, size, has_descriptor)
+
+    def skip(self, file, method, compressed_size, has_descriptor):
+        if has_descriptor:
+            self.copy(file, method, compressed_size, has_descriptor, lambda data: None)
+            return
+
+        while compressed_size:
+            compressed_size -= len(self.read_some(file, min(CHUNK_SIZE, compressed_size)))
+
+    def copy(self, file, method, compressed_size, has_descriptor, write):
+        """Descomprime os dados do membro atual em `write` e retorna o CRC e o tamanho esperados."""
+        decompressor = zlib.decompressobj(-15) if method == zipfile.ZIP_DEFLATED else None
+
+        if has_descriptor:
+            # O fim do fluxo deflate delimita o membro; o que sobrar é do próximo
+            while not decompressor.eof:
+                write(decompressor.decompress(self.read_some(file, CHUNK_SIZE)))
+
+            if decompressor.unused_data:
+                self.unread(file, len(decompressor.unused_data))
+
+            return self.read_descriptor(file)
+
+        remaining = compressed_size
+
+        while remaining:
+            chunk = self.read_some(file, min(CHUNK_SIZE, remaining))
+            remaining -= len(chunk)
+            write(decompressor.decompress(chunk) if decompressor else chunk)
+
+        if decompressor:
+            write(decompressor.flush())
+
+        return None
+
+    def extract_member(self, file, member_path, method, crc, compressed_size, size, has_descriptor):
+        destination = self.manifest.local_path(member_path)
+        temp_path = destination + ".part"
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+        digest = hashlib.sha256()
+        actual_crc = 0
+        written = 0
+
+        try:
+            with open(temp_path, "wb") as output:
+
+                def write(data):
+                    nonlocal actual_crc, written
+                    output.write(data)
+                    digest.update(data)
+                    actual_crc = zlib.crc32(data, actual_crc)
+                    written += len(data)
+
+                descriptor = self.copy(file, method, compressed_size, has_descriptor, write)
+
+            if descriptor is not None:
+                crc, compressed_size, size = descriptor
+
+            if actual_crc != crc or written != size:
+                raise ValueError(f"CRC inválido no membro do ZIP: {member_path}")
+
+            if has_descriptor and self.manifest.is_current(member_path, crc, size):
+                os.remove(temp_path)
+                return
+
+            os.replace(temp_path, destination)
+            self.manifest.record(member_path, crc, size, digest.hexdigest())
+
+            if self.store is not None:
+                self.store.add(member_path, crc, size, digest.hexdigest(), destination)
+
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def read_descriptor(self, file):
+        data = self.read(file, 4)
+
+        if data == DESCRIPTOR_SIGNATURE:
+            data = self.read(file, 4)
+
+        crc = struct.unpack("<I", data)[0]
+        compressed_size, size = struct.unpack("<II", self.read(file, 8))
+        return crc, compressed_size, size
+
+
+def has_zip64_extra(extra):
+    while len(extra) >= 4:
+        tag, length = struct.unpack("<HH", extra[:4])
+
+        if tag == 0x0001:
+            return True
+
+        extra = extra[4 + length :]
+
+    return False
+
+
+def write_member(zip_file, info, destination):
+    """Copia um membro do ZIP para o destino em blocos, sem carregá-lo inteiro na memória."""
+    temp_path = destination + ".part"
+    digest = hashlib.sha256()
+
+    try:
+        with zip_file.open(info) as source, open(temp_path, "wb") as output:
+            while chunk := source.read(CHUNK_SIZE):
+                output.write(chunk)
+                digest.update(chunk)
+
+        os.replace(temp_path, destination)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return digest.hexdigest()
+
+
+def extract_archive(path, manifest, workers=EXTRACT_WORKERS, on_progress=None, store=None, only=None, wanted=None):
+    """Extrai para `manifest.dest_dir` os membros do ZIP que mudaram desde a última instalação.
+
+    Os diretórios são criados uma única vez antes da extração, e os membros são
+    distribuídos entre `workers` threads, cada uma com seu próprio `ZipFile`.
+    Membros que já estão na `store` (`ModStore`) são ligados a partir dela em vez
+    de extraídos, e os extraídos passam a fazer parte dela. Arquivos registrados no
+    manifesto que saíram do modpack são removidos, assim como os que `wanted(caminho)`
+    recusa (componentes não escolhidos). Com `only`, só os membros com esses
+    caminhos relativos são considerados, e nada é removido.
+    """
+    with zipfile.ZipFile(path) as zip_file:
+        infos = zip_file.infolist()
+
+    directories = set()
+    members = set()
+    pending = []
+
+    for info in infos:
+        member_path = member_destination(info.filename)
+
+        if not member_path or (only is not None and member_path not in only):
+            continue
+
+        if info.is_dir():
+            directories.add(manifest.local_path(member_path.rstrip("/")))
+            continue
+
+        if wanted is not None and not wanted(member_path):
+            continue
+
+        members.add(member_path)
+        directories.add(os.path.dirname(manifest.local_path(member_path)))
+
+        # Arquivos que não mudaram desde a última instalação ficam intactos
+        if not manifest.is_current(member_path, info.CRC, info.file_size):
+            pending.append((member_path, info))
+
+    for directory in sorted(directories):
+        os.makedirs(directory, exist_ok=True)
+
+    local = threading.local()
+    opened = []
+    lock = threading.Lock()
+    done = 0
+
+    def extract(member_path, info):
+        nonlocal done
+
+        destination = manifest.local_path(member_path)
+        sha256 = store.place(member_path, info.CRC, info.file_size, destination) if store is not None else None
+
+        if sha256 is None:
+            if getattr(local, "zip_file", None) is None:
+                local.zip_file = zipfile.ZipFile(path)
+                opened.append(local.zip_file)
+
+            sha256 = write_member(local.zip_file, info, destination)
+
+            if store is not None:
+                store.add(member_path, info.CRC, info.file_size, sha256, destination)
+
+        manifest.record(member_path, info.CRC, info.file_size, sha256)
+
+        with lock:
+            done += 1
+            if on_progress is not None:
+                on_progress(done, len(pending))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for future in [executor.submit(extract, *item) for item in pending]:
+                future.result()
+    finally:
+        for zip_file in opened:
+            zip_file.close()
+
+    # Uma extração parcial não sabe o que saiu do modpack
+    if only is None:
+        for member_path in manifest.stale(members):
+            destination = manifest.local_path(member_path)
+
+            if os.path.isfile(destination):
+                os.remove(destination)
+
+            manifest.forget(member_path)
+
+    manifest.save()
+    return members
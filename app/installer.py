@@ -0,0 +1,944 @@
+import os
+import asyncio
+import hashlib
+import http.client
+import zipfile
+import threading
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
+from .manifest import Manifest
+from .staging import LOCK_NAME, StagedInstall
+from .cache import ArchiveCache
+from .store import ModStore
+from .telemetry import Telemetry
+from .utils import FileLock
+from .network import HEADERS, RETRIES, backoff, download_file, open_connection
+from .transport import ConnectionPool, MirroredDownload, MirrorSet
+from .subset import SubsetUnavailable, fetch_subset
+from .integrity import file_sha256, verify_archive, verify_install
+from .patch import INDEX_NAME, apply_patch, archive_members, find_chain, load_index
+from .config import (
+    PRESET_DATA,
+    PRESETS,
+    SHADERS,
+    SHADER_PRESETS,
+    all_components,
+    apply_presets,
+    component_filter,
+    select_components,
+)
+from .progress import ProgressThrottle, RateEstimator, format_eta
+from .extract import EXTRACT_WORKERS, StreamingExtractor, extract_archive
+
+URL = "https://codeload.github.com/devleonardoamaral/minecraft_ultimaesperanca_modpack/zip/refs/heads/master"
+# Outros endereços do mesmo arquivo, usados conforme a velocidade medida e em caso de falha
+MIRRORS = []
+# Responde só o SHA do último commit (40 bytes) e aceita If-None-Match
+REVISION_URL = "https://api.github.com/repos/devleonardoamaral/minecraft_ultimaesperanca_modpack/commits/master"
+# Índice dos patches entre revisões, gerados com `python -m app.patch make`
+PATCH_INDEX_URL = "https://github.com/devleonardoamaral/minecraft_ultimaesperanca_modpack/releases/download/patches/index.json"
+
+
+class Installer:
+    """Motor de instalação do modpack, independente da interface gráfica.
+
+    O progresso é informado por `on_progress(etapa, mensagem)`, com a etapa de 0 a
+    100. O mesmo motor é usado pela janela (`App`) e pelo modo de linha de comando.
+    """
+
+    def __init__(self, on_progress=None, cache=None, store=None, telemetry=None):
+        self.on_progress = on_progress
+        self.url = URL
+        self.revision_url = REVISION_URL
+        self.patch_url = PATCH_INDEX_URL
+        self.mirrors = list(MIRRORS)
+        # SHA-256 publicado do arquivo do modpack, quando disponível
+        self.sha256 = None
+        self.cache = cache or ArchiveCache()
+        # Loja de mods compartilhada entre perfis; None extrai tudo em cada perfil
+        self.store = store if store is not None else ModStore()
+        self.telemetry = telemetry or Telemetry()
+        # Número de conexões simultâneas quando o servidor aceita faixas de bytes
+        self.connections = 4
+        # `TokenBucket` que limita a banda dos downloads; None usa toda a conexão
+        self.limiter = None
+        self.extract_workers = EXTRACT_WORKERS
+        # Extrai os membros enquanto o arquivo do modpack ainda está sendo baixado
+        self.streaming = True
+        self.modpack_size = 350
+        self.presets = PRESET_DATA
+        self.downloading = False
+        self.progress = 0
+        # Laço de eventos e tarefa do download em andamento, para o cancelamento
+        self.loop = None
+        self.task = None
+
+    def spawn(self, on_progress):
+        """Cria um motor com as mesmas configurações e o mesmo cache, mas outro destino de progresso."""
+        installer = Installer(on_progress, self.cache, self.store, self.telemetry)
+        installer.url = self.url
+        installer.revision_url = self.revision_url
+        installer.patch_url = self.patch_url
+        installer.mirrors = self.mirrors
+        installer.sha256 = self.sha256
+        installer.connections = self.connections
+        installer.limiter = self.limiter
+        installer.extract_workers = self.extract_workers
+        installer.streaming = self.streaming
+        installer.modpack_size = self.modpack_size
+        installer.presets = self.presets
+        return installer
+
+    def update_progress(self, step, status):
+        self.progress = step
+
+        if self.on_progress is not None:
+            self.on_progress(step, status)
+
+    def prepare_dest(self, dest_dir):
+        os.makedirs(dest_dir, exist_ok=True)
+
+        with self.telemetry.phase("preparar", dest_dir=dest_dir) as info:
+            staged = StagedInstall(dest_dir)
+
+            # O serviço em segundo plano, ou outra janela, pode estar instalando no mesmo diretório
+            if not staged.lock.acquire(blocking=False):
+                info["waited"] = True
+                self.update_progress(self.progress, "Aguardando outra instalação neste diretório...")
+
+            staged.prepare()
+
+        return staged
+
+    def extract_zip(
+        self,
+        zip_path,
+        dest_dir,
+        manifest=None,
+        progress_start: int = 80,
+        progress_end: int = 90,
+        only=None,
+        wanted=None,
+    ):
+        if manifest is None:
+            manifest = Manifest.load(dest_dir) or Manifest(dest_dir)
+
+        throttle = ProgressThrottle()
+
+        with self.telemetry.phase("extrair", dest_dir=dest_dir) as info:
+
+            def on_progress(done, total):
+                step = progress_start + ((progress_end - progress_start) * (done / total))
+                info["files"] = total
+
+                if done == total or throttle.ready(step):
+                    self.update_progress(step, f"Extraindo arquivos... {done} / {total}")
+
+            members = extract_archive(
+                zip_path, manifest, self.extract_workers, on_progress, self.store, only, wanted
+            )
+            info["members"] = len(members)
+
+    def mirror_set(self):
+        """Espelhos do modpack com as medidas guardadas no cache; `url` é sempre o principal."""
+        return MirrorSet([self.url, *self.mirrors], os.path.join(self.cache.cache_dir, "mirrors.json"))
+
+    def run_async(self, function, *args):
+        """Executa a corrotina `function(*args)` em um laço de eventos desta thread.
+
+        O laço e a tarefa ficam registrados para que `cancel`, chamado de outra thread,
+        cancele a tarefa.
+        """
+
+        async def run():
+            self.loop = asyncio.get_running_loop()
+            self.task = asyncio.current_task()
+
+            if self.downloading is False:
+                raise asyncio.CancelledError()
+
+            return await function(*args)
+
+        try:
+            return asyncio.run(run())
+        except asyncio.CancelledError:
+            raise Exception("Download cancelado")
+        finally:
+            self.task = None
+            self.loop = None
+
+    def download(self, temp, progress_start: int, progress_end: int, extra_headers=None):
+        """Baixa o modpack com o transporte assíncrono."""
+        started_size = temp.size
+
+        with self.telemetry.phase("baixar", url=self.url, connections=self.connections) as info:
+            try:
+                response = self.run_async(self.download_async, temp, progress_start, progress_end, extra_headers)
+                info["status"] = response.status
+                return response
+            finally:
+                # Aproximado: um download segmentado retomado conta também as faixas anteriores
+                info["bytes"] = max(temp.size - started_size, 0)
+
+    async def download_async(self, temp, progress_start: int, progress_end: int, extra_headers=None):
+        self.update_progress(progress_start, "Iniciando Download...")
+        mirrors = self.mirror_set()
+
+        for attempt in range(RETRIES + 1):
+            estimator = RateEstimator()
+            throttle = ProgressThrottle()
+
+            def on_progress(total_bytes, total_length, label):
+                self.report_download(
+                    total_bytes, total_length, progress_start, progress_end, estimator, throttle, label
+                )
+
+            download = MirroredDownload(mirrors, temp, self.connections, extra_headers, on_progress, self.limiter)
+
+            try:
+                return await download.run()
+            except (OSError, asyncio.TimeoutError) as error:
+                if attempt == RETRIES:
+                    raise
+
+                # Com outro espelho disponível a troca é imediata; senão espera antes de insistir
+                delay = 0 if len(mirrors.mirrors) > 1 else backoff(attempt)
+                self.telemetry.event("retry", phase="baixar", attempt=attempt + 1, error=str(error), delay=delay)
+                self.update_progress(
+                    self.progress, f"Conexão interrompida ({error}), tentando novamente em {delay}s..."
+                )
+                await asyncio.sleep(delay)
+
+    def report_download(
+        self, total_bytes, total_length, progress_start, progress_end, estimator, throttle, label="Baixando..."
+    ):
+        """Repassa o progresso do download, limitado no tempo e com velocidade de janela móvel."""
+        if total_length > 0:
+            fraction = total_bytes / total_length
+        else:
+            fraction = total_bytes / max(total_bytes, self.modpack_size * 1024**2)
+
+        progress_value = progress_start + ((progress_end - progress_start) * fraction)
+        estimator.add(total_bytes)
+
+        if not throttle.ready(progress_value):
+            return
+
+        speed_mb = estimator.rate() / (1024**2)
+        total_mb = total_bytes / (1024**2)
+
+        if total_length > 0:
+            eta = format_eta(estimator.eta(total_length - total_bytes))
+            status = f"{label} {total_mb:.2f} / {total_length / (1024**2):.2f} MB | {speed_mb:.2f} MB/s | {eta}"
+        else:
+            status = f"{label} {total_mb:.2f} MB baixados | {speed_mb:.2f} MB/s"
+
+        self.update_progress(progress_value, status)
+
+    def probe(self, extra_headers=None):
+        """Faz uma requisição HEAD para descobrir o tamanho e o suporte a faixas do servidor."""
+        connection = open_connection(self.url)
+
+        try:
+            connection.request("HEAD", urlparse(self.url).path, headers={**HEADERS, **(extra_headers or {})})
+            response = connection.getresponse()
+            response.read()
+
+            if response.status >= 500:
+                raise ConnectionError(f"Erro HTTP {response.status} {response.reason}")
+            if response.status >= 400 and response.status != 405:
+                raise Exception(f"Erro HTTP {response.status} {response.reason}")
+
+            return response
+
+        finally:
+            connection.close()
+
+    def fetch(self, progress_start: int, progress_end: int, manifest=None, revalidate=False, wanted=None):
+        """Retorna `(caminho, confirmado)` do arquivo do modpack, baixando-o apenas se o cache não servir.
+
+        Com um `manifest`, os membros do ZIP aceitos por `wanted` são extraídos para o
+        destino enquanto o download acontece. Com `revalidate`, o cache é sempre
+        confirmado com o servidor, mesmo dentro da janela de validade. `confirmado` é
+        falso quando, sem conexão, a cópia do cache foi usada sem saber se ainda é a
+        mais recente.
+        """
+        entry = self.cache.lookup(self.url)
+
+        if entry is not None and not revalidate and self.cache.is_fresh(entry):
+            self.update_progress(progress_end, "Usando modpack do cache...")
+            return self.cache.touch(self.url), True
+
+        def on_wait():
+            self.update_progress(progress_start, "Aguardando outro download do modpack...")
+
+        with self.cache.open_writer(self.url, on_wait) as temp:
+            # Enquanto a trava era esperada, outro processo (o serviço) pode ter baixado o mesmo arquivo
+            current = self.cache.lookup(self.url)
+
+            if current is not None and current != entry and self.cache.is_fresh(current):
+                self.update_progress(progress_end, "Usando modpack do cache...")
+                return self.cache.touch(self.url), True
+
+            entry = current
+            extractor = None
+
+            if manifest is not None:
+                extractor = StreamingExtractor(temp.temp_path, manifest, self.store, wanted)
+                temp.watcher = extractor
+                extractor.start()
+
+            try:
+                try:
+                    response = self.download(
+                        temp, progress_start, progress_end, self.cache.conditional_headers(entry)
+                    )
+                except OSError:
+                    # Sem rede, uma cópia já baixada é melhor do que falhar
+                    if entry is None:
+                        raise
+                    self.update_progress(progress_end, "Sem conexão, usando modpack do cache...")
+                    return self.cache.touch(self.url), False
+
+                if response.status == 304:
+                    self.update_progress(progress_end, "Modpack do cache está atualizado.")
+                    return self.cache.touch(self.url, revalidated=True), True
+
+                temp.announce(temp.size)
+
+                if extractor is not None:
+                    self.update_progress(progress_end, "Concluindo extração...")
+                    extractor.finish()
+                    extractor.join()
+
+            finally:
+                if extractor is not None:
+                    extractor.abort()
+                    extractor.join()
+
+            self.update_progress(progress_end, "Verificando integridade do download...")
+
+            try:
+                # Membros extraídos em streaming já tiveram o CRC conferido
+                verify_archive(
+                    temp.temp_path,
+                    temp.expected_size,
+                    temp.hash.hexdigest(),
+                    self.sha256,
+                    check_crc=extractor is None or not extractor.complete,
+                )
+            except ValueError:
+                temp.discard()
+                raise
+
+            return temp.commit(), True
+
+    def subset_key(self, selected):
+        """Chave no cache do ZIP parcial com os componentes `selected`."""
+        return f"{self.url}#componentes={'+'.join(sorted(selected))}"
+
+    def cached_subset(self, selected):
+        """Retorna `(chave, entrada)` do ZIP parcial mais recente no cache que cobre `selected`, ou None.
+
+        Um ZIP baixado para vários perfis juntos (ou pelo serviço em segundo plano)
+        serve a cada um deles.
+        """
+        prefix = self.subset_key(())
+        found = None
+
+        for key in self.cache.urls(prefix):
+            entry = self.cache.lookup(key)
+
+            if entry is None or not set(selected) <= set(key[len(prefix) :].split("+")):
+                continue
+            if found is None or entry.get("checked", 0) > found[1].get("checked", 0):
+                found = (key, entry)
+
+        return found
+
+    def fetch_components(self, selected, progress_start: int, progress_end: int, manifest=None, revalidate=False):
+        """Retorna `(caminho, confirmado)` de um ZIP com ao menos os componentes `selected`.
+
+        Se algum componente fica de fora e o arquivo completo não está no cache, só os
+        membros escolhidos são baixados, com faixas de bytes (`fetch_subset`). Quando
+        o servidor não permite isso, cai no arquivo completo de `fetch`.
+        """
+        wanted = component_filter(selected, self.presets)
+
+        # O arquivo completo já no cache serve para qualquer escolha
+        if wanted is None or self.cache.lookup(self.url) is not None:
+            return self.fetch(progress_start, progress_end, manifest, revalidate, wanted)
+
+        key, entry = self.cached_subset(selected) or (self.subset_key(selected), None)
+
+        if entry is not None:
+            if not revalidate and self.cache.is_fresh(entry):
+                self.update_progress(progress_end, "Usando componentes do cache...")
+                return self.cache.touch(key), True
+
+            if entry.get("etag") and self.archive_unchanged(entry["etag"]):
+                self.update_progress(progress_end, "Componentes do cache estão atualizados.")
+                return self.cache.touch(key, revalidated=True), True
+
+        try:
+            return self.download_subset(self.subset_key(selected), wanted, progress_start, progress_end), True
+        except (SubsetUnavailable, OSError, asyncio.TimeoutError) as error:
+            self.update_progress(progress_start, f"Download parcial indisponível ({error}), baixando tudo...")
+            return self.fetch(progress_start, progress_end, manifest, revalidate, wanted)
+
+    def download_subset(self, key, wanted, progress_start: int, progress_end: int):
+        """Baixa só os membros aceitos por `wanted` para um ZIP parcial guardado no cache sob `key`."""
+        partial_dir = os.path.join(self.cache.cache_dir, "partial")
+        os.makedirs(partial_dir, exist_ok=True)
+        temp_path = os.path.join(partial_dir, hashlib.sha1(key.encode()).hexdigest() + ".subset")
+
+        estimator = RateEstimator()
+        throttle = ProgressThrottle()
+
+        def on_progress(done, total):
+            self.report_download(
+                done, total, progress_start, progress_end, estimator, throttle, "Baixando componentes..."
+            )
+
+        async def run():
+            pool = ConnectionPool(limiter=self.limiter)
+
+            try:
+                return await fetch_subset(pool, self.url, temp_path, wanted, self.connections, on_progress)
+            finally:
+                pool.close()
+
+        lock = FileLock(temp_path + ".lock")
+        previous = self.cache.lookup(key)
+
+        if not lock.acquire(blocking=False):
+            self.update_progress(progress_start, "Aguardando outro download dos componentes...")
+
+        # O mesmo arquivo temporário serviria a outro processo baixando os mesmos componentes
+        with lock:
+            current = self.cache.lookup(key)
+
+            # Enquanto a trava era esperada, o outro processo pode ter guardado o mesmo ZIP
+            if current is not None and current != previous and self.cache.is_fresh(current):
+                self.update_progress(progress_end, "Usando componentes do cache...")
+                return self.cache.touch(key)
+
+            self.update_progress(progress_start, "Iniciando Download...")
+
+            with self.telemetry.phase("baixar-componentes", url=self.url, connections=self.connections) as info:
+                try:
+                    etag, last_modified, info["bytes"] = self.run_async(run)
+                    self.update_progress(progress_end, "Verificando integridade do download...")
+                    verify_archive(temp_path)
+                except BaseException:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+                    raise
+
+            return self.cache.store(
+                temp_path, file_sha256(temp_path), os.path.getsize(temp_path), key, etag, last_modified
+            )
+
+    def cancel(self):
+        self.downloading = False
+        loop, task = self.loop, self.task
+
+        if task is not None:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                # O laço terminou enquanto o cancelamento era pedido
+                pass
+
+    def post_installation(self, dest_dir, preset, shader, shader_preset, progress_start: int, progress_end: int):
+        def on_file(position, total, name):
+            self.update_progress(
+                progress_start + ((progress_end - progress_start) * (position / total)),
+                f"Configurando '{os.path.basename(name)}'...",
+            )
+
+        with self.telemetry.phase("configurar", dest_dir=dest_dir, preset=preset, shader=shader) as info:
+            info["changed"] = len(apply_presets(dest_dir, preset, shader, shader_preset, self.presets, on_file))
+
+        self.update_progress(progress_end, "Configurações aplicadas!")
+
+    def latest_revision(self, known=None):
+        """Descobre o último commit do modpack com uma requisição condicional de poucos bytes.
+
+        Retorna `{"sha", "etag"}`, ou None se não foi possível consultar.
+        """
+        if not self.revision_url:
+            return None
+
+        headers = {**HEADERS, "Accept": "application/vnd.github.sha"}
+        if known and known.get("etag"):
+            headers["If-None-Match"] = known["etag"]
+
+        connection = open_connection(self.revision_url, timeout=10)
+
+        try:
+            connection.request("GET", urlparse(self.revision_url).path, headers=headers)
+            response = connection.getresponse()
+            body = response.read()
+
+            if response.status == 304:
+                return {"sha": known.get("sha"), "etag": known.get("etag")}
+            if response.status != 200:
+                return None
+
+            return {"sha": body.decode().strip(), "etag": response.headers.get("ETag")}
+
+        except (OSError, http.client.HTTPException):
+            return None
+
+        finally:
+            connection.close()
+
+    def archive_unchanged(self, etag):
+        """Confere com um HEAD condicional se o arquivo do modpack ainda tem o `etag` informado."""
+        try:
+            response = self.probe({"If-None-Match": etag})
+        except Exception:
+            return False
+
+        return response.status == 304 or response.headers.get("ETag") == etag
+
+    def check_update(self, manifest):
+        """Retorna `(atualizado, revisão_mais_recente)` para a instalação descrita por `manifest`."""
+        recorded = (manifest.revision if manifest is not None else None) or {}
+        latest = self.latest_revision(recorded)
+
+        if manifest is None or not manifest.is_intact(self.presets.get("files", {})):
+            return False, latest
+
+        if latest is not None:
+            return latest["sha"] == recorded.get("sha"), latest
+
+        # Sem a API, o ETag do próprio arquivo do modpack serve de revisão
+        # Se o arquivo mudou, a revisão anotada não descreve mais o conteúdo novo
+        if recorded.get("archive_etag") and self.archive_unchanged(recorded["archive_etag"]):
+            return True, recorded
+
+        return False, None
+
+    def record_revision(self, manifest, revision, archive=True):
+        """Anota no `manifest` a revisão instalada, salva junto com ele na extração.
+
+        Com `archive` falso (atualização por patches) o ETag do arquivo em cache não
+        descreve a instalação e não é registrado.
+        """
+        entry = None
+
+        if archive:
+            entry = self.cache.lookup(self.url)
+
+            if entry is None and manifest.components is not None:
+                entry = (self.cached_subset(manifest.components) or (None, None))[1]
+        manifest.revision = {
+            "sha": (revision or {}).get("sha"),
+            "etag": (revision or {}).get("etag"),
+            "archive_etag": (entry or {}).get("etag"),
+        }
+
+    def installed_components(self, manifest):
+        return set(manifest.components) if manifest.components is not None else all_components(self.presets)
+
+    def patch_index(self):
+        """Baixa o índice de patches publicado, ou retorna None se não houver."""
+        if not self.patch_url:
+            return None
+
+        directory = os.path.join(self.cache.cache_dir, "patches")
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, INDEX_NAME)
+
+        try:
+            download_file(self.patch_url, path, timeout=10)
+            return load_index(path)
+        except Exception:
+            return None
+
+    def patch_chain(self, manifest, revision, index=None):
+        """Retorna os patches que levam a instalação de `manifest` até `revision`, ou None."""
+        recorded = (manifest.revision if manifest is not None else None) or {}
+
+        if revision is None or not recorded.get("sha") or recorded["sha"] == revision["sha"]:
+            return None
+
+        index = index if index is not None else self.patch_index()
+        return find_chain(index, recorded["sha"], revision["sha"]) if index is not None else None
+
+    def fetch_patches(self, chain, progress_start: int, progress_end: int):
+        """Baixa para o cache os patches de `chain` que ainda não estão lá e retorna seus caminhos."""
+        directory = os.path.join(self.cache.cache_dir, "patches")
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+
+        for position, entry in enumerate(chain):
+            path = os.path.join(directory, os.path.basename(entry["file"]))
+
+            if not os.path.exists(path) or file_sha256(path) != entry["sha256"]:
+                step = progress_start + (progress_end - progress_start) * position / len(chain)
+                self.update_progress(step, f"Baixando patch {position + 1} / {len(chain)}...")
+
+                sha256 = download_file(
+                    urljoin(self.patch_url, entry["file"]),
+                    path,
+                    limiter=self.limiter,
+                    cancelled=lambda: not self.downloading,
+                )
+                verify_archive(path, entry["size"], sha256, entry["sha256"])
+
+            paths.append(path)
+
+        return paths
+
+    def patch(self, staged, chain, revision, progress_start: int, progress_end: int, wanted=None):
+        """Atualiza a preparação aplicando `chain`. Retorna False se for preciso o arquivo completo."""
+        if not chain:
+            return False
+
+        middle = (progress_start + progress_end) / 2
+        self.downloading = True
+
+        with self.telemetry.phase("patch", patches=len(chain)) as info:
+            try:
+                paths = self.fetch_patches(chain, progress_start, middle)
+
+                for position, path in enumerate(paths):
+                    start = middle + (progress_end - middle) * position / len(paths)
+                    end = middle + (progress_end - middle) * (position + 1) / len(paths)
+
+                    def on_progress(done, total):
+                        # Chamado a cada arquivo do patch: é onde o cancelamento é atendido
+                        if not self.downloading:
+                            raise Exception("Download cancelado")
+
+                        step = start + (end - start) * (done / total if total else 1)
+                        self.update_progress(step, f"Aplicando patch {position + 1} / {len(paths)}... {done} / {total}")
+
+                    apply_patch(path, staged.manifest, on_progress, self.store, wanted)
+
+                self.record_revision(staged.manifest, revision, archive=False)
+                staged.manifest.save()
+                return True
+
+            except Exception as error:
+                info["error"] = f"{type(error).__name__}: {error}"
+
+                # Cancelado pelo usuário: não cai no download completo
+                if not self.downloading:
+                    staged.abort()
+                    raise
+
+                # A preparação pode ter ficado pela metade: recomeça dos arquivos instalados
+                self.update_progress(progress_start, f"Patch indisponível ({error}), baixando o modpack completo...")
+                staged.prepare()
+                return False
+
+            finally:
+                self.downloading = False
+
+    def install(self, dest_dir, preset=PRESETS[0], shader=SHADERS[-1], shader_preset=SHADER_PRESETS[1], force=False):
+        """Instala ou atualiza o modpack em `dest_dir`. Retorna False se ele já estava atualizado."""
+        with self.telemetry.phase("instalar", dest_dir=dest_dir, force=force):
+            # Passo 0: Verifica se há algo novo antes de baixar qualquer coisa
+            self.update_progress(5, "Verificando atualizações...")
+            manifest = Manifest.load(dest_dir)
+            with self.telemetry.phase("verificar") as info:
+                up_to_date, revision = self.check_update(manifest)
+                info["up_to_date"] = up_to_date
+
+            # Mudar de shader pode pedir arquivos que não foram instalados, ou tornar outros dispensáveis
+            selected = select_components(preset, shader, shader_preset, self.presets)
+            same_components = manifest is not None and self.installed_components(manifest) == selected
+            wanted = component_filter(selected, self.presets)
+
+            if up_to_date and same_components and not force:
+                self.post_installation(dest_dir, preset, shader, shader_preset, 90, 100)
+                return False
+
+            # Passo 1: Prepara a nova instalação ao lado da atual, que fica intacta até o fim
+            self.update_progress(10, "Preparando diretório...")
+            staged = self.prepare_dest(dest_dir)
+
+            # Passo 2: Com patches publicados desde a revisão instalada, baixa só as diferenças
+            chain = None
+            if same_components and manifest.is_intact(self.presets.get("files", {})):
+                chain = self.patch_chain(manifest, revision)
+
+            if self.patch(staged, chain, revision, 10, 80, wanted):
+                self.apply(staged, None, preset, shader, shader_preset, revision)
+                return True
+
+            # Senão baixa novos arquivos (extraindo durante o download) ou reaproveita o cache
+            try:
+                self.downloading = True
+                # Se há um commit novo, o cache recente não basta: confirma com o servidor
+                archive_path, confirmed = self.fetch_components(
+                    selected, 10, 80, staged.manifest if self.streaming else None, revalidate=revision is not None
+                )
+            except BaseException:
+                staged.abort()
+                raise
+            finally:
+                self.downloading = False
+
+            # Um arquivo antigo do cache, usado sem conexão, não instala a revisão nova
+            self.apply(staged, archive_path, preset, shader, shader_preset, revision if confirmed else None)
+            return True
+
+    def apply(self, staged, archive_path, preset, shader, shader_preset, revision=None):
+        """Termina a instalação preparada; sem `archive_path`, ela já foi atualizada por patches."""
+        selected = select_components(preset, shader, shader_preset, self.presets)
+
+        try:
+            staged.manifest.components = sorted(selected)
+
+            if archive_path is not None:
+                self.record_revision(staged.manifest, revision)
+
+                # Passo 3: Extraí o que não foi extraído durante o download e remove arquivos obsoletos
+                self.update_progress(80, "Extraindo arquivos...")
+                wanted = component_filter(selected, self.presets)
+                self.extract_zip(archive_path, staged.staging_dir, staged.manifest, wanted=wanted)
+            else:
+                staged.manifest.save()
+
+            # Passo 4: Troca a instalação atual pela nova
+            self.update_progress(90, "Aplicando atualização...")
+            with self.telemetry.phase("aplicar", dest_dir=staged.dest_dir):
+                staged.commit()
+        except BaseException:
+            staged.abort()
+            raise
+
+        if self.store is not None:
+            self.store.register(staged.dest_dir)
+
+        self.post_installation(staged.dest_dir, preset, shader, shader_preset, 90, 100)
+
+    def restore_from_store(self, manifest, expected):
+        """Restaura da loja os arquivos de `expected` e retorna os que não estavam nela."""
+        missing = []
+
+        for name, entry in expected.items():
+            destination = manifest.local_path(name)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+            if self.store is None or not self.store.place(
+                name, entry["crc"], entry["size"], destination, entry["sha256"]
+            ):
+                missing.append(name)
+            elif file_sha256(destination) != entry["sha256"]:
+                # O objeto era um hardlink do próprio arquivo danificado
+                self.store.discard(entry["sha256"])
+                missing.append(name)
+            else:
+                manifest.record(name, entry["crc"], entry["size"], entry["sha256"])
+
+        return missing
+
+    def repair(self, dest_dir, preset=PRESETS[0], shader=SHADERS[-1], shader_preset=SHADER_PRESETS[1], full=False):
+        """Confere a instalação em `dest_dir` e restaura só os arquivos que faltam ou foram alterados.
+
+        Os arquivos vêm da loja de mods, do arquivo do modpack no cache (ou baixado,
+        se preciso) e, se ele já for de outra revisão, de uma atualização completa.
+        Retorna a lista de arquivos restaurados.
+        """
+        with self.telemetry.phase("reparar", dest_dir=dest_dir, full=full) as info:
+            if Manifest.load(dest_dir) is None:
+                raise Exception(f"Nenhuma instalação do modpack encontrada em {dest_dir}")
+
+            # O reparo grava direto na instalação: nenhuma outra pode trocá-la enquanto isso
+            lock = FileLock(os.path.join(dest_dir, LOCK_NAME))
+
+            if not lock.acquire(blocking=False):
+                info["waited"] = True
+                self.update_progress(0, "Aguardando outra instalação neste diretório...")
+                lock.acquire()
+
+            try:
+                # Quem tinha a trava pode ter acabado de trocar a instalação
+                manifest = Manifest.load(dest_dir)
+                throttle = ProgressThrottle()
+
+                def on_verify(done, total):
+                    step = 40 * done / total
+
+                    if done == total or throttle.ready(step):
+                        self.update_progress(step, f"Verificando arquivos... {done} / {total}")
+
+                self.update_progress(0, "Verificando arquivos...")
+                damaged = verify_install(
+                    manifest, self.extract_workers, full, self.presets.get("files", {}), on_verify
+                )
+                info["damaged"] = len(damaged)
+
+                # Sem o `mtime`, a extração não confia em um arquivo alterado no lugar; e, como a
+                # entrada continua no manifesto, um reparo que falhe não o faz parecer intacto
+                expected = {name: dict(manifest.files[name]) for name in damaged}
+                for name in damaged:
+                    manifest.invalidate(name)
+                manifest.save()
+                missing = []
+
+                if damaged:
+                    self.update_progress(40, f"Restaurando {len(damaged)} arquivos...")
+                    missing = self.restore_from_store(manifest, expected)
+
+                    if missing:
+                        self.downloading = True
+                        try:
+                            archive_path, _ = self.fetch_components(self.installed_components(manifest), 40, 70)
+                        finally:
+                            self.downloading = False
+
+                        with zipfile.ZipFile(archive_path) as zip_file:
+                            members = archive_members(zip_file)
+
+                        # Só serve o membro idêntico ao que foi instalado
+                        matching = {
+                            name
+                            for name in missing
+                            if name in members
+                            and members[name].CRC == expected[name]["crc"]
+                            and members[name].file_size == expected[name]["size"]
+                        }
+                        self.extract_zip(archive_path, dest_dir, manifest, 70, 90, only=matching)
+                        missing = [name for name in missing if name not in matching]
+
+                    manifest.save()
+            finally:
+                # A atualização completa abaixo pega a trava de novo ao preparar a instalação
+                lock.release()
+
+            if missing:
+                self.update_progress(70, "O modpack mudou desde a instalação, atualizando...")
+                self.install(dest_dir, preset, shader, shader_preset, force=True)
+                return damaged
+
+            self.post_installation(dest_dir, preset, shader, shader_preset, 90, 100)
+            return damaged
+
+    def plan(self, targets, latest, force=False):
+        """Retorna `(precisa_atualizar, cadeia_de_patches, componentes)` de cada um dos `targets`."""
+        index = None
+        plans = []
+
+        for target in targets:
+            manifest = Manifest.load(target["dest_dir"])
+            recorded = (manifest.revision if manifest is not None else None) or {}
+            intact = manifest is not None and manifest.is_intact(self.presets.get("files", {}))
+            current = latest is not None and recorded.get("sha") == latest["sha"]
+            chain = None
+
+            if intact and not current and not force:
+                if index is None:
+                    index = self.patch_index() or {"patches": []}
+                chain = self.patch_chain(manifest, latest, index)
+
+            selected = select_components(
+                target.get("preset", PRESETS[0]),
+                target.get("shader", SHADERS[-1]),
+                target.get("shader_preset", SHADER_PRESETS[1]),
+                self.presets,
+            )
+            same_components = manifest is not None and self.installed_components(manifest) == selected
+
+            if not same_components:
+                chain = None
+
+            plans.append((force or not (current and intact and same_components), chain, selected))
+
+        return plans
+
+    def needed_components(self, plans):
+        # Um único arquivo serve a todos: com os componentes que qualquer alvo a atualizar escolheu
+        return set().union(*(selected for needs_update, _, selected in plans if needs_update))
+
+    def install_many(self, targets, workers=None, force=False):
+        """Baixa o modpack uma única vez e o instala em todos os `targets` em paralelo.
+
+        Cada alvo é um dicionário com `dest_dir` e, opcionalmente, `preset`, `shader` e
+        `shader_preset`. Alvos que já estão na revisão mais recente só têm as
+        configurações reaplicadas, e nada é baixado se todos estiverem. Alvos com uma
+        cadeia de patches são atualizados por ela, e o arquivo completo só é baixado
+        se algum alvo precisar. Retorna um dicionário `dest_dir -> erro` (ou None em
+        caso de sucesso). As mensagens de progresso de cada alvo vêm prefixadas pelo
+        diretório.
+        """
+        with self.telemetry.phase("instalar-varios", targets=len(targets), force=force):
+            self.update_progress(0, "Verificando atualizações...")
+            latest = self.latest_revision()
+            plans = self.plan(targets, latest, force)
+            needed = self.needed_components(plans)
+
+            archive = []
+            archive_lock = threading.Lock()
+
+            def archive_path():
+                # Baixado uma única vez, na primeira vez em que algum alvo precisar dele
+                with archive_lock:
+                    if not archive:
+                        try:
+                            self.downloading = True
+                            archive.append(self.fetch_components(needed, 0, 80, revalidate=latest is not None))
+                        finally:
+                            self.downloading = False
+
+                    return archive[0]
+
+            if any(needs_update and not chain for needs_update, chain, _ in plans):
+                archive_path()
+
+            # Patches em comum entre alvos são baixados uma vez, antes de as instalações começarem
+            self.downloading = True
+
+            try:
+                for _, chain, _ in plans:
+                    if chain:
+                        try:
+                            self.fetch_patches(chain, 0, 80)
+                        except Exception:
+                            if not self.downloading:
+                                raise
+            finally:
+                self.downloading = False
+
+            def run(target, needs_update, chain, selected):
+                dest_dir = target["dest_dir"]
+                installer = self.spawn(lambda step, status: self.update_progress(step, f"{dest_dir}: {status}"))
+                options = (
+                    target.get("preset", PRESETS[0]),
+                    target.get("shader", SHADERS[-1]),
+                    target.get("shader_preset", SHADER_PRESETS[1]),
+                )
+
+                if not needs_update:
+                    installer.post_installation(dest_dir, *options, 90, 100)
+                    return
+
+                staged = installer.prepare_dest(dest_dir)
+
+                if installer.patch(staged, chain, latest, 10, 80, component_filter(selected, self.presets)):
+                    installer.apply(staged, None, *options, latest)
+                else:
+                    path, confirmed = archive_path()
+                    installer.apply(staged, path, *options, latest if confirmed else None)
+
+            results = {}
+
+            with ThreadPoolExecutor(max_workers=workers or len(targets) or 1) as executor:
+                futures = {
+                    target["dest_dir"]: executor.submit(run, target, *plan) for target, plan in zip(targets, plans)
+                }
+
+                for dest_dir, future in futures.items():
+                    try:
+                        future.result()
+                        results[dest_dir] = None
+                    except Exception as error:
+                        results[dest_dir] = error
+
+            return results
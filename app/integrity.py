@@ -0,0 +1,84 @@
+import os
+import hashlib
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from .extract import CHUNK_SIZE, EXTRACT_WORKERS
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        while chunk := file.read(CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def verify_archive(path, size=0, sha256=None, expected_sha256=None, check_crc=True):
+    """Confere o arquivo baixado antes da extração.
+
+    Verifica o tamanho anunciado pelo servidor, o SHA-256 publicado (quando houver)
+    e o CRC de cada membro registrado no diretório central do ZIP. Com `check_crc`
+    falso apenas o diretório central é lido.
+    """
+    with open(path, "rb") as file:
+        actual_size = file.seek(0, 2)
+
+        if size and actual_size != size:
+            raise ValueError(f"Tamanho do download incorreto: {actual_size} de {size} bytes")
+
+        if expected_sha256 and sha256 and sha256.lower() != expected_sha256.lower():
+            raise ValueError("SHA-256 do download não corresponde ao publicado")
+
+        file.seek(0)
+        try:
+            with zipfile.ZipFile(file) as zip_file:
+                bad_member = zip_file.testzip() if check_crc else None
+        except zipfile.BadZipFile as error:
+            raise ValueError(f"Arquivo do modpack corrompido: {error}")
+
+        if bad_member is not None:
+            raise ValueError(f"Arquivo do modpack corrompido: {bad_member}")
+
+
+def verify_install(manifest, workers=EXTRACT_WORKERS, full=False, ignore=(), on_progress=None):
+    """Confere os arquivos instalados contra `manifest` e retorna os que faltam ou foram alterados.
+
+    O tamanho e o `mtime` guardados no manifesto servem de índice: arquivos em que
+    eles não mudaram são dados como intactos sem serem lidos, a não ser com `full`.
+    Os demais têm o SHA-256 calculado em `workers` threads, e os que continuam
+    iguais ao instalado (só foram tocados) têm o `mtime` atualizado no manifesto,
+    para não serem lidos de novo na próxima verificação. Arquivos em `ignore` (as
+    configurações reescritas pelas predefinições) não são conferidos.
+    """
+    names = [name for name in manifest.files if name not in ignore]
+    pending = [
+        name
+        for name in names
+        if full or not manifest.is_current(name, manifest.files[name]["crc"], manifest.files[name]["size"])
+    ]
+
+    def check(name):
+        entry = manifest.files[name]
+        path = manifest.local_path(name)
+
+        try:
+            if os.path.getsize(path) != entry["size"] or file_sha256(path) != entry["sha256"]:
+                return False
+        except OSError:
+            return False
+
+        manifest.record(name, entry["crc"], entry["size"], entry["sha256"])
+        return True
+
+    damaged = []
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        for done, (name, intact) in enumerate(zip(pending, executor.map(check, pending)), 1):
+            if not intact:
+                damaged.append(name)
+            if on_progress is not None:
+                on_progress(done, len(pending))
+
+    return damaged
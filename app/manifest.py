@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+
+MANIFEST_NAME = ".modpack_manifest.json"
+
+
+class Manifest:
+    """Registro dos arquivos instalados pelo modpack em um diretório do Minecraft.
+
+    Cada entrada guarda o CRC32 e o tamanho do membro no ZIP de origem, o SHA-256
+    do conteúdo gravado e o `mtime` do arquivo no disco. Com isso é possível saber,
+    sem reler o arquivo, se ele ainda corresponde ao que foi instalado.
+    """
+
+    def __init__(self, dest_dir, files=None, revision=None, components=None):
+        self.dest_dir = dest_dir
+        self.files = files if files is not None else {}
+        # Revisão instalada: SHA do commit e ETags usados na verificação de atualização
+        self.revision = revision
+        # Componentes do modpack instalados; None (manifestos antigos) quer dizer todos
+        self.components = components
+        self.lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.dest_dir, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, dest_dir):
+        try:
+            with open(os.path.join(dest_dir, MANIFEST_NAME), "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        return cls(dest_dir, data.get("files", {}), data.get("revision"), data.get("components"))
+
+    def save(self):
+        temp_path = self.path + ".tmp"
+
+        with self.lock, open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(
+                {"version": 1, "revision": self.revision, "components": self.components, "files": self.files},
+                file,
+                indent=1,
+                sort_keys=True,
+            )
+
+        os.replace(temp_path, self.path)
+
+    def local_path(self, name):
+        return os.path.join(self.dest_dir, *name.split("/"))
+
+    def record(self, name, crc, size, sha256):
+        stat = os.stat(self.local_path(name))
+
+        with self.lock:
+            self.files[name] = {"crc": crc, "size": size, "sha256": sha256, "mtime": stat.st_mtime_ns}
+
+    def is_current(self, name, crc, size):
+        """Retorna True se o arquivo instalado corresponde ao membro `crc`/`size` do ZIP."""
+        entry = self.files.get(name)
+
+        if entry is None or entry["crc"] != crc or entry["size"] != size:
+            return False
+
+        try:
+            stat = os.stat(self.local_path(name))
+        except OSError:
+            return False
+
+        return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime"]
+
+    def is_intact(self, ignore=()):
+        """Retorna True se nenhum arquivo instalado sumiu ou foi alterado (só consulta `stat`).
+
+        Arquivos em `ignore` (as configurações reescritas pelas predefinições) não contam.
+        """
+        return all(
+            self.is_current(name, entry["crc"], entry["size"])
+            for name, entry in self.files.items()
+            if name not in ignore
+        )
+
+    def stale(self, names):
+        """Retorna os arquivos registrados que não fazem mais parte do modpack."""
+        return [name for name in self.files if name not in names]
+
+    def invalidate(self, name):
+        """Mantém o arquivo registrado, mas deixa de confiar no `mtime` dele até ser gravado de novo."""
+        with self.lock:
+            if name in self.files:
+                self.files[name] = {**self.files[name], "mtime": None}
+
+    def forget(self, name):
+        self.files.pop(name, None)
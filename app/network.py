@@ -0,0 +1,148 @@
+import os
+import re
+import time
+import hashlib
+import threading
+import http.client
+from urllib.parse import urljoin, urlparse
+
+HEADERS = {
+    "User-Agent": "Python-Downloader",
+    "Referer": "https://codeload.github.com/",
+    "Accept": "*/*",
+}
+
+RETRIES = 5
+MAX_BACKOFF = 30
+TIMEOUT = 30
+
+REDIRECTS = 5
+
+# Arquivos menores do que isso não compensam o custo de várias conexões
+SEGMENT_MIN_SIZE = 8 * 1024**2
+SEGMENTS_PER_CONNECTION = 4
+
+
+def parse_content_range(value):
+    """Retorna `(início, tamanho_total)` de um cabeçalho `Content-Range`."""
+    match = re.fullmatch(r"bytes (\d+)-(\d+)/(\d+|\*)", (value or "").strip())
+
+    if match is None:
+        raise ValueError(f"Content-Range inválido: {value}")
+
+    total = match.group(3)
+    return int(match.group(1)), int(total) if total != "*" else 0
+
+
+def backoff(attempt):
+    return min(2**attempt, MAX_BACKOFF)
+
+
+def contiguous_size(segments):
+    """Retorna quantos bytes do início do arquivo já foram baixados sem lacunas."""
+    size = 0
+
+    for start, end, done in segments:
+        size = start + done
+
+        if start + done <= end:
+            break
+
+    return size
+
+
+class TokenBucket:
+    """Limite de banda compartilhado por todas as conexões de um download.
+
+    O balde enche a `rate` bytes por segundo até `burst` bytes. Cada bloco recebido
+    retira seu tamanho do balde, mesmo que ele fique negativo, e quem o recebeu
+    espera o tempo de o saldo voltar a zero. Ao atrasar a leitura, o TCP reduz a
+    janela e o servidor desacelera, então a média fica em `rate` sem descartar nada.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(rate, 64 * 1024)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, size):
+        """Retira `size` bytes do balde e retorna quantos segundos esperar antes de continuar."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= size
+
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def wait(self, size):
+        delay = self.reserve(size)
+
+        if delay:
+            time.sleep(delay)
+
+
+def open_connection(url, timeout=TIMEOUT):
+    parsed_url = urlparse(url)
+
+    # HTTP simples só serve para espelhos locais e para os benchmarks
+    if parsed_url.scheme == "http":
+        return http.client.HTTPConnection(parsed_url.netloc, timeout=timeout)
+
+    return http.client.HTTPSConnection(parsed_url.netloc, timeout=timeout)
+
+
+def download_file(url, path, headers=None, timeout=TIMEOUT, limiter=None, cancelled=None):
+    """Baixa `url` para `path` seguindo redirecionamentos e retorna o SHA-256 do conteúdo.
+
+    Serve para arquivos pequenos e avulsos (índices, patches), sem cache nem retomada.
+    Com `limiter` (`TokenBucket`), a leitura respeita o limite de banda. Se
+    `cancelled()` passar a retornar True, o download é interrompido.
+    """
+    for _ in range(REDIRECTS + 1):
+        parsed_url = urlparse(url)
+        connection = open_connection(url, timeout)
+
+        try:
+            target = parsed_url.path + (f"?{parsed_url.query}" if parsed_url.query else "")
+            connection.request("GET", target, headers={**HEADERS, **(headers or {})})
+            response = connection.getresponse()
+
+            if response.status in (301, 302, 303, 307, 308) and response.headers.get("Location"):
+                response.read()
+                url = urljoin(url, response.headers["Location"])
+                continue
+
+            if response.status >= 500:
+                raise ConnectionError(f"Erro HTTP {response.status} {response.reason}")
+            if response.status != 200:
+                raise Exception(f"Erro HTTP {response.status} {response.reason}")
+
+            digest = hashlib.sha256()
+            temp_path = path + ".part"
+
+            try:
+                with open(temp_path, "wb") as file:
+                    while chunk := response.read(64 * 1024):
+                        if cancelled is not None and cancelled():
+                            raise Exception("Download cancelado")
+
+                        file.write(chunk)
+                        digest.update(chunk)
+
+                        if limiter is not None:
+                            limiter.wait(len(chunk))
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            os.replace(temp_path, path)
+            return digest.hexdigest()
+
+        finally:
+            connection.close()
+
+    raise ConnectionError(f"Redirecionamentos demais ao baixar {url}")
@@ -0,0 +1,414 @@
+import os
+import re
+import sys
+import json
+import heapq
+import struct
+import hashlib
+import zipfile
+import argparse
+from .extract import CHUNK_SIZE, is_safe_relative, member_destination
+from .integrity import file_sha256
+
+PATCH_FORMAT = 1
+PATCH_HEADER = "patch.json"
+INDEX_NAME = "index.json"
+
+# Os blocos terminam em quebras de linha ou em cabeçalhos de membro de um jar
+BOUNDARY = re.compile(rb"PK\x03\x04|\n")
+MIN_CHUNK = 1024
+MAX_CHUNK = 64 * 1024
+# Arquivos menores vão inteiros: o delta não compensa e as predefinições podem tê-los alterado
+MIN_DELTA_SIZE = 64 * 1024
+
+COPY = struct.Struct(">QI")
+INSERT = struct.Struct(">I")
+
+
+class PatchUnavailable(Exception):
+    pass
+
+
+def chunk_boundaries(data):
+    """Divide `data` em blocos `(início, fim)` cortados conforme o conteúdo.
+
+    Como os cortes dependem dos bytes e não da posição, um trecho inserido ou
+    removido só muda os blocos ao redor dele, e o resto continua reconhecível.
+    """
+    chunks = []
+    start = 0
+
+    for match in BOUNDARY.finditer(data):
+        position = match.start()
+
+        while position - start > MAX_CHUNK:
+            chunks.append((start, start + MAX_CHUNK))
+            start += MAX_CHUNK
+
+        if position - start >= MIN_CHUNK:
+            chunks.append((start, position))
+            start = position
+
+    while len(data) - start > MAX_CHUNK:
+        chunks.append((start, start + MAX_CHUNK))
+        start += MAX_CHUNK
+
+    if start < len(data):
+        chunks.append((start, len(data)))
+
+    return chunks
+
+
+def make_delta(source, target):
+    """Descreve `target` como cópias de trechos de `source` e bytes novos.
+
+    Retorna `(delta, bytes_copiados)`. O delta é uma sequência de operações
+    `C<posição><tamanho>` (copia da origem) e `I<tamanho><bytes>` (insere).
+    """
+    index = {}
+
+    for start, end in chunk_boundaries(source):
+        index.setdefault(hashlib.blake2b(source[start:end], digest_size=16).digest(), (start, end - start))
+
+    delta = bytearray()
+    copy = None
+    literal = bytearray()
+    copied = 0
+
+    def flush():
+        nonlocal copy
+
+        if copy is not None:
+            delta.extend(b"C" + COPY.pack(*copy))
+            copy = None
+        if literal:
+            delta.extend(b"I" + INSERT.pack(len(literal)) + literal)
+            literal.clear()
+
+    for start, end in chunk_boundaries(target):
+        found = index.get(hashlib.blake2b(target[start:end], digest_size=16).digest())
+
+        if found is None:
+            if copy is not None:
+                flush()
+            literal.extend(target[start:end])
+            continue
+
+        if literal:
+            flush()
+
+        offset, length = found
+        copied += length
+
+        # Trechos consecutivos na origem viram uma única cópia
+        if copy is not None and copy[0] + copy[1] == offset:
+            copy[1] += length
+        else:
+            flush()
+            copy = [offset, length]
+
+    flush()
+    return bytes(delta), copied
+
+
+def read_exact(file, size):
+    data = file.read(size)
+
+    if len(data) != size:
+        raise ValueError("Patch corrompido: dados truncados")
+
+    return data
+
+
+def copy_exact(source, output, length, digest):
+    while length > 0:
+        chunk = read_exact(source, min(CHUNK_SIZE, length))
+        output.write(chunk)
+        digest.update(chunk)
+        length -= len(chunk)
+
+
+def apply_delta(source_path, delta, output):
+    """Reconstrói em `output` o arquivo descrito por `delta` e retorna seu SHA-256."""
+    digest = hashlib.sha256()
+
+    with open(source_path, "rb") as source:
+        while operation := delta.read(1):
+            if operation == b"C":
+                offset, length = COPY.unpack(read_exact(delta, COPY.size))
+                source.seek(offset)
+                copy_exact(source, output, length, digest)
+            elif operation == b"I":
+                (length,) = INSERT.unpack(read_exact(delta, INSERT.size))
+                copy_exact(delta, output, length, digest)
+            else:
+                raise ValueError("Patch corrompido: operação desconhecida")
+
+    return digest.hexdigest()
+
+
+def archive_members(zip_file):
+    """Retorna `caminho_relativo -> ZipInfo` dos arquivos do ZIP do codeload."""
+    members = {}
+
+    for info in zip_file.infolist():
+        name = member_destination(info.filename)
+
+        if name and not info.is_dir():
+            members[name] = info
+
+    return members
+
+
+def make_patch(old_path, new_path, patch_path, from_revision, to_revision):
+    """Gera em `patch_path` o patch que leva o ZIP `old_path` ao ZIP `new_path`.
+
+    O patch é um ZIP (LZMA) com `patch.json` e um membro por arquivo alterado: um
+    delta contra a versão anterior quando compensa, ou o conteúdo inteiro. Retorna
+    a entrada do patch para o índice.
+    """
+    files = {}
+
+    with zipfile.ZipFile(old_path) as old_zip, zipfile.ZipFile(new_path) as new_zip:
+        old_members = archive_members(old_zip)
+        new_members = archive_members(new_zip)
+
+        with zipfile.ZipFile(patch_path, "w", zipfile.ZIP_LZMA) as patch:
+            for name, info in new_members.items():
+                previous = old_members.get(name)
+
+                if previous is not None and (previous.CRC, previous.file_size) == (info.CRC, info.file_size):
+                    continue
+
+                data = new_zip.read(info)
+                entry = {"crc": info.CRC, "size": info.file_size, "sha256": hashlib.sha256(data).hexdigest()}
+                payload = data
+
+                if previous is not None and info.file_size >= MIN_DELTA_SIZE:
+                    source = old_zip.read(previous)
+                    delta, copied = make_delta(source, data)
+
+                    if copied and len(delta) < len(data):
+                        entry["source"] = hashlib.sha256(source).hexdigest()
+                        payload = delta
+
+                entry["payload"] = f"files/{len(files):05d}"
+                patch.writestr(entry["payload"], payload)
+                files[name] = entry
+
+            header = {
+                "format": PATCH_FORMAT,
+                "from": from_revision,
+                "to": to_revision,
+                "files": files,
+                "deleted": sorted(set(old_members) - set(new_members)),
+            }
+            patch.writestr(PATCH_HEADER, json.dumps(header, indent=1, sort_keys=True))
+
+    return {
+        "from": from_revision,
+        "to": to_revision,
+        "file": os.path.basename(patch_path),
+        "size": os.path.getsize(patch_path),
+        "sha256": file_sha256(patch_path),
+    }
+
+
+def load_index(path):
+    with open(path, "r", encoding="utf-8") as file:
+        index = json.load(file)
+
+    if index.get("format") != PATCH_FORMAT:
+        raise ValueError(f"Formato de índice de patches desconhecido: {index.get('format')}")
+
+    return index
+
+
+def add_to_index(directory, entry):
+    """Registra `entry` no `index.json` de `directory`, substituindo um patch com as mesmas revisões."""
+    path = os.path.join(directory, INDEX_NAME)
+
+    try:
+        index = load_index(path)
+    except FileNotFoundError:
+        index = {"format": PATCH_FORMAT, "patches": []}
+
+    index["patches"] = [
+        patch for patch in index["patches"] if (patch["from"], patch["to"]) != (entry["from"], entry["to"])
+    ]
+    index["patches"].append(entry)
+    index["latest"] = entry["to"]
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(index, file, indent=1)
+    os.replace(temp_path, path)
+
+    return index
+
+
+def find_chain(index, from_revision, to_revision):
+    """Retorna a sequência de patches com menos bytes de `from_revision` a `to_revision`, ou None."""
+    queue = [(0, 0, from_revision, [])]
+    visited = set()
+    counter = 1
+
+    while queue:
+        size, _, revision, chain = heapq.heappop(queue)
+
+        if revision == to_revision:
+            return chain
+        if revision in visited:
+            continue
+        visited.add(revision)
+
+        for patch in index.get("patches", []):
+            if patch["from"] == revision and patch["to"] not in visited:
+                heapq.heappush(queue, (size + patch["size"], counter, patch["to"], chain + [patch]))
+                counter += 1
+
+    return None
+
+
+def apply_patch(path, manifest, on_progress=None, store=None, wanted=None):
+    """Aplica o patch em `path` aos arquivos descritos por `manifest` e retorna a revisão final.
+
+    Todas as origens dos deltas são conferidas antes de qualquer gravação; se alguma
+    não corresponder ao que o patch espera, `PatchUnavailable` é lançada. Cada
+    arquivo é reconstruído ao lado do original e só então o substitui, o que
+    preserva o conteúdo de hardlinks compartilhados com a instalação atual. Arquivos
+    que já estão na `store` são ligados a partir dela sem ler o patch, e os que
+    `wanted(caminho)` recusa (componentes não instalados) são ignorados.
+    """
+    with zipfile.ZipFile(path) as patch:
+        header = json.loads(patch.read(PATCH_HEADER))
+
+        if header.get("format") != PATCH_FORMAT:
+            raise PatchUnavailable(f"Formato de patch desconhecido: {header.get('format')}")
+
+        # Os nomes vêm do patch baixado: nenhum pode gravar ou apagar fora do destino
+        for name in [*header["files"], *header["deleted"]]:
+            if not name or not is_safe_relative(name):
+                raise ValueError(f"Caminho inseguro detectado no patch: {name}")
+
+        files = {name: entry for name, entry in header["files"].items() if wanted is None or wanted(name)}
+
+        for name, entry in files.items():
+            if "source" not in entry:
+                continue
+
+            current = manifest.files.get(name)
+
+            if (
+                current is None
+                or current.get("sha256") != entry["source"]
+                or not manifest.is_current(name, current["crc"], current["size"])
+            ):
+                raise PatchUnavailable(f"{name} não corresponde à revisão de origem do patch")
+
+        total = len(files)
+
+        for position, (name, entry) in enumerate(files.items()):
+            if on_progress is not None:
+                on_progress(position, total)
+
+            destination = manifest.local_path(name)
+            temp_path = destination + ".part"
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+            if store is not None and store.place(name, entry["crc"], entry["size"], destination, entry["sha256"]):
+                manifest.record(name, entry["crc"], entry["size"], entry["sha256"])
+                continue
+
+            try:
+                with patch.open(entry["payload"]) as payload, open(temp_path, "wb") as output:
+                    if "source" in entry:
+                        sha256 = apply_delta(destination, payload, output)
+                    else:
+                        digest = hashlib.sha256()
+                        while chunk := payload.read(CHUNK_SIZE):
+                            output.write(chunk)
+                            digest.update(chunk)
+                        sha256 = digest.hexdigest()
+
+                if sha256 != entry["sha256"]:
+                    raise ValueError(f"Patch gerou um arquivo diferente do esperado: {name}")
+
+                os.replace(temp_path, destination)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+
+            manifest.record(name, entry["crc"], entry["size"], sha256)
+
+            if store is not None:
+                store.add(name, entry["crc"], entry["size"], sha256, destination)
+
+        for name in header["deleted"]:
+            local_path = manifest.local_path(name)
+
+            if os.path.exists(local_path):
+                os.remove(local_path)
+            manifest.forget(name)
+
+        if on_progress is not None:
+            on_progress(total, total)
+
+    return header["to"]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m app.patch", description="Gera e aplica patches entre revisões do modpack."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    make = commands.add_parser("make", help="gera o patch entre dois ZIPs do codeload")
+    make.add_argument("old", help="ZIP da revisão anterior")
+    make.add_argument("new", help="ZIP da nova revisão")
+    make.add_argument("--from", dest="from_revision", required=True, help="SHA do commit anterior")
+    make.add_argument("--to", dest="to_revision", required=True, help="SHA do novo commit")
+    make.add_argument("--output", default="patches", help="diretório dos patches e do index.json")
+
+    apply = commands.add_parser("apply", help="aplica um patch a uma instalação")
+    apply.add_argument("patch", help="arquivo do patch")
+    apply.add_argument("dest_dir", help="diretório do Minecraft")
+    return parser
+
+
+def main(argv=None):
+    from .staging import StagedInstall
+
+    args = build_parser().parse_args(argv)
+
+    if args.command == "make":
+        os.makedirs(args.output, exist_ok=True)
+        patch_path = os.path.join(args.output, f"{args.from_revision[:12]}-{args.to_revision[:12]}.patch")
+        entry = make_patch(args.old, args.new, patch_path, args.from_revision, args.to_revision)
+        add_to_index(args.output, entry)
+        print(f"{entry['file']}: {entry['size'] / 1024**2:.2f} MB")
+        return 0
+
+    staged = StagedInstall(args.dest_dir)
+    staged.prepare()
+
+    try:
+        revision = apply_patch(args.patch, staged.manifest)
+        staged.manifest.revision = {"sha": revision, "etag": None, "archive_etag": None}
+        staged.manifest.save()
+        staged.commit()
+    except PatchUnavailable as error:
+        staged.abort()
+        print(f"Falhou: {error}")
+        return 1
+    except BaseException:
+        staged.abort()
+        raise
+
+    print(f"{args.dest_dir}: atualizado para {revision}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import time
+from collections import deque
+
+
+class RateEstimator:
+    """Estima a velocidade de transferência em uma janela móvel de `window` segundos.
+
+    Diferente da média desde o início, reflete rapidamente quedas e retomadas da
+    conexão, o que deixa a velocidade e o tempo restante exibidos mais honestos.
+    """
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self.samples = deque()
+
+    def add(self, total, now=None):
+        now = time.monotonic() if now is None else now
+        self.samples.append((now, total))
+
+        # Mantém ao menos duas amostras para sempre haver uma taxa
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window:
+            self.samples.popleft()
+
+    def rate(self):
+        if len(self.samples) < 2:
+            return 0.0
+
+        (first_time, first_total), (last_time, last_total) = self.samples[0], self.samples[-1]
+        elapsed = last_time - first_time
+        return (last_total - first_total) / elapsed if elapsed > 0 else 0.0
+
+    def eta(self, remaining):
+        rate = self.rate()
+        return remaining / rate if rate > 0 else None
+
+
+class ProgressThrottle:
+    """Decide quando uma atualização de progresso merece ser repassada.
+
+    Repassa no máximo uma a cada `interval` segundos, e só se a etapa avançou ao
+    menos `min_step`; mesmo parada, a cada `max_interval` segundos a mensagem é
+    renovada para a velocidade não congelar na tela.
+    """
+
+    def __init__(self, interval=0.1, min_step=0.5, max_interval=1.0):
+        self.interval = interval
+        self.min_step = min_step
+        self.max_interval = max_interval
+        self.last_time = None
+        self.last_step = None
+
+    def ready(self, step, now=None):
+        now = time.monotonic() if now is None else now
+
+        if self.last_time is not None:
+            elapsed = now - self.last_time
+            moved = abs(step - self.last_step) >= self.min_step
+
+            if not ((elapsed >= self.interval and moved) or elapsed >= self.max_interval):
+                return False
+
+        self.last_time = now
+        self.last_step = step
+        return True
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "calculando..."
+
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+
+    if hours:
+        return f"{hours}h{minutes:02d}m restantes"
+
+    return f"{minutes:02d}:{seconds:02d} restantes"
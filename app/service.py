@@ -0,0 +1,199 @@
+import os
+import re
+import sys
+import random
+import threading
+import subprocess
+from .network import TokenBucket
+
+# Intervalo padrão entre verificações de atualização
+INTERVAL = 6 * 60 * 60
+# Com uma atualização já baixada esperando o jogo fechar, confere de novo nesse intervalo
+WAIT_INTERVAL = 5 * 60
+# Variação aleatória dos intervalos, para que vários computadores não consultem o GitHub juntos
+JITTER = 0.1
+WAITING = "aguardando o jogo fechar"
+
+
+def run_listing(command, **options):
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=30, **options)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+    return result.stdout.splitlines() if result.returncode == 0 else None
+
+
+def running_processes():
+    """Retorna `(executável, linha_de_comando)` dos processos em execução, ou None se não der para listá-los."""
+    if sys.platform.startswith("linux"):
+        processes = []
+
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+
+            try:
+                with open(f"/proc/{pid}/cmdline", "rb") as file:
+                    arguments = file.read().decode(errors="replace").split("\0")
+            except OSError:
+                # O processo terminou ou pertence a outro usuário
+                continue
+
+            processes.append((arguments[0], " ".join(arguments)))
+
+        return processes
+
+    if sys.platform == "win32":
+        query = (
+            "Get-CimInstance Win32_Process -Filter \"Name like 'java%'\" "
+            "| ForEach-Object { $_.Name + \"`t\" + $_.CommandLine }"
+        )
+        lines = run_listing(
+            ["powershell", "-NoProfile", "-NonInteractive", "-Command", query],
+            creationflags=subprocess.CREATE_NO_WINDOW,
+        )
+        return None if lines is None else [tuple(line.split("\t", 1)) for line in lines if "\t" in line]
+
+    # No macOS o `comm` é o caminho completo do executável, que pode ter espaços
+    names = run_listing(["ps", "-axww", "-o", "pid=,comm="])
+    commands = run_listing(["ps", "-axww", "-o", "pid=,command="])
+
+    if names is None or commands is None:
+        return None
+
+    executables = dict(line.strip().split(" ", 1) for line in names if " " in line.strip())
+    return [
+        (executables.get(pid, ""), command)
+        for pid, command in (line.strip().split(" ", 1) for line in commands if " " in line.strip())
+    ]
+
+
+def game_running(dest_dir, processes=None):
+    """Retorna True se algum Java aberto usa `dest_dir` como diretório do jogo.
+
+    Os launchers passam o diretório na linha de comando (`--gameDir`). Só conta um
+    processo cujo executável é o `java`/`javaw`, e não um que apenas mencione o
+    caminho, como o próprio serviço. Sem como listar os processos, o jogo é dado como
+    aberto, para nunca trocar arquivos em uso.
+    """
+    processes = running_processes() if processes is None else processes
+
+    if processes is None:
+        return True
+
+    path = os.path.normcase(os.path.abspath(dest_dir)).rstrip("\\/")
+    # O caminho inteiro: `.minecraft` não pode casar com `.minecraft2`
+    pattern = re.compile(re.escape(path) + r"(?=[\\/\"'\s]|$)")
+
+    for executable, command in processes:
+        name = re.split(r"[\\/]", executable.strip().strip('"'))[-1].lower()
+
+        if re.sub(r"\.exe$", "", name) in ("java", "javaw") and pattern.search(os.path.normcase(command)):
+            return True
+
+    return False
+
+
+class UpdateService:
+    """Mantém os `targets` atualizados em segundo plano, com o mesmo motor da janela.
+
+    A cada `interval` segundos, procura uma revisão nova do modpack. Havendo uma, o
+    que as instalações vão precisar (patches ou o arquivo do modpack, só com os
+    componentes escolhidos) é baixado para o cache limitado a `bandwidth` bytes por
+    segundo. Cada alvo é atualizado, com a troca atômica de sempre, assim que o jogo
+    não estiver aberto nele; enquanto estiver, a verificação se repete a cada
+    `WAIT_INTERVAL`. A instalação em si só lê o cache, então também é instantânea
+    quando feita pela janela antes de o serviço chegar a ela.
+    """
+
+    def __init__(self, installer, targets, interval=INTERVAL, bandwidth=None):
+        self.installer = installer
+        self.targets = targets
+        self.interval = interval
+        self.bandwidth = bandwidth
+        self.stopped = threading.Event()
+
+    def prestage(self, plans, latest):
+        """Baixa para o cache, sob o limite de banda, tudo que as instalações de `plans` vão usar."""
+        installer = self.installer
+        installer.limiter = TokenBucket(self.bandwidth) if self.bandwidth else None
+        installer.downloading = True
+
+        try:
+            with installer.telemetry.phase("pre-carregar", bandwidth=self.bandwidth):
+                if any(needs_update and not chain for needs_update, chain, _ in plans):
+                    installer.fetch_components(
+                        installer.needed_components(plans), 0, 80, revalidate=latest is not None
+                    )
+
+                for needs_update, chain, _ in plans:
+                    if needs_update and chain:
+                        try:
+                            installer.fetch_patches(chain, 0, 80)
+                        except Exception:
+                            # A instalação cai no arquivo completo, que é baixado então
+                            continue
+        finally:
+            installer.downloading = False
+            installer.limiter = None
+
+    def run_once(self):
+        """Faz uma verificação completa. Retorna `dest_dir -> situação` (texto ou a exceção)."""
+        installer = self.installer
+
+        with installer.telemetry.phase("servico", targets=len(self.targets)) as info:
+            latest = installer.latest_revision()
+
+            # Sem saber a revisão mais recente, cada alvo pareceria desatualizado
+            if latest is None:
+                info["skipped"] = True
+                return {target["dest_dir"]: "revisão mais recente indisponível" for target in self.targets}
+
+            plans = installer.plan(self.targets, latest)
+            results = {
+                target["dest_dir"]: "atualizado" for target, plan in zip(self.targets, plans) if not plan[0]
+            }
+
+            if len(results) == len(self.targets):
+                return results
+
+            self.prestage(plans, latest)
+            ready = []
+
+            for target, (needs_update, _, _) in zip(self.targets, plans):
+                if not needs_update:
+                    continue
+
+                if game_running(target["dest_dir"]):
+                    results[target["dest_dir"]] = WAITING
+                    installer.telemetry.event("adiado", phase="servico", dest_dir=target["dest_dir"])
+                else:
+                    ready.append(target)
+
+            if ready:
+                for dest_dir, error in installer.install_many(ready).items():
+                    results[dest_dir] = error or "instalado"
+
+            info["installed"] = sum(1 for status in results.values() if status == "instalado")
+            return results
+
+    def run(self, on_result=None):
+        """Verifica até `stop`. `on_result(resultados)` recebe o retorno de cada `run_once`."""
+        while not self.stopped.is_set():
+            try:
+                results = self.run_once()
+            except Exception as error:
+                results = {target["dest_dir"]: error for target in self.targets}
+
+            if on_result is not None:
+                on_result(results)
+
+            # Um alvo esperando o jogo fechar ou uma falha de rede não devem esperar horas
+            retry = any(status == WAITING or isinstance(status, Exception) for status in results.values())
+            delay = WAIT_INTERVAL if retry else self.interval
+            self.stopped.wait(delay * random.uniform(1 - JITTER, 1 + JITTER))
+
+    def stop(self):
+        self.stopped.set()
+        self.installer.cancel()
@@ -0,0 +1,145 @@
+import os
+import shutil
+from .manifest import MANIFEST_NAME, Manifest
+from .utils import FileLock
+
+STAGING_NAME = ".modpack_staging"
+PREVIOUS_NAME = ".modpack_previous"
+# Trava de quem está preparando uma instalação no diretório (janela, linha de comando ou serviço)
+LOCK_NAME = ".modpack_lock"
+
+
+def link_or_copy(source, destination):
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        # Sistemas de arquivos sem hardlink (FAT32, exFAT, alguns compartilhamentos)
+        shutil.copy2(source, destination)
+
+
+class StagedInstall:
+    """Instalação em uma pasta de preparação trocada pela atual com renomeações atômicas.
+
+    A pasta de preparação fica dentro do diretório do Minecraft, no mesmo sistema de
+    arquivos, e começa com hardlinks dos arquivos já instalados para que a extração
+    incremental só grave o que mudou. No `commit`, cada item de primeiro nível
+    (`mods`, `config`, `options.txt`...) da instalação atual é movido para a geração
+    anterior e substituído pelo preparado. Enquanto isso não acontece a instalação
+    atual fica intacta, e `rollback` desfaz uma atualização com as mesmas renomeações.
+
+    Do `prepare` até o `commit` (ou `abort`), o diretório fica travado em `LOCK_NAME`:
+    outra instalação no mesmo destino, mesmo de outro processo, espera a vez.
+    """
+
+    def __init__(self, dest_dir):
+        self.dest_dir = dest_dir
+        self.staging_dir = os.path.join(dest_dir, STAGING_NAME)
+        self.previous_dir = os.path.join(dest_dir, PREVIOUS_NAME)
+        self.live_manifest = Manifest.load(dest_dir)
+        self.manifest = None
+        self.lock = FileLock(os.path.join(dest_dir, LOCK_NAME))
+
+    def prepare(self):
+        if self.lock.file is None:
+            self.lock.acquire()
+            # Quem tinha a trava pode ter acabado de trocar a instalação
+            self.live_manifest = Manifest.load(self.dest_dir)
+
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir)
+
+        os.makedirs(self.staging_dir)
+        files = {}
+
+        for name, entry in (self.live_manifest.files if self.live_manifest else {}).items():
+            source = self.live_manifest.local_path(name)
+
+            if os.path.isfile(source):
+                link_or_copy(source, os.path.join(self.staging_dir, *name.split("/")))
+                files[name] = dict(entry)
+
+        self.manifest = Manifest(self.staging_dir, files)
+        return self.manifest
+
+    def fill_untracked(self):
+        """Traz para a preparação os arquivos que não são do modpack, como configs geradas pelo jogo."""
+        tracked = set(self.live_manifest.files) if self.live_manifest else set()
+
+        for name in os.listdir(self.staging_dir):
+            live_path = os.path.join(self.dest_dir, name)
+
+            # Sem manifesto não há como separar mods nossos de mods antigos: a pasta é substituída
+            if not os.path.isdir(live_path) or (name == "mods" and self.live_manifest is None):
+                continue
+
+            for root, _, files in os.walk(live_path):
+                for file_name in files:
+                    source = os.path.join(root, file_name)
+                    relative = os.path.relpath(source, self.dest_dir).replace(os.sep, "/")
+                    destination = os.path.join(self.staging_dir, relative)
+
+                    if relative not in tracked and not os.path.lexists(destination):
+                        link_or_copy(source, destination)
+
+    def swap(self, source_dir, target_dir, names):
+        """Move `names` de `dest_dir` para `target_dir` e os de `source_dir` para `dest_dir`."""
+        moved = []
+
+        try:
+            for name in names:
+                live_path = os.path.join(self.dest_dir, name)
+                step = [name, os.path.lexists(live_path), False]
+                moved.append(step)
+
+                if step[1]:
+                    os.replace(live_path, os.path.join(target_dir, name))
+
+                os.replace(os.path.join(source_dir, name), live_path)
+                step[2] = True
+
+        except BaseException:
+            for name, had_live, moved_in in reversed(moved):
+                live_path = os.path.join(self.dest_dir, name)
+
+                if moved_in:
+                    os.replace(live_path, os.path.join(source_dir, name))
+                if had_live:
+                    os.replace(os.path.join(target_dir, name), live_path)
+            raise
+
+    def commit(self):
+        self.fill_untracked()
+
+        if os.path.exists(self.previous_dir):
+            shutil.rmtree(self.previous_dir)
+        os.makedirs(self.previous_dir)
+
+        # O manifesto vai por último: se algo falhar antes, a instalação atual continua descrita por ele
+        names = sorted(os.listdir(self.staging_dir), key=lambda name: name == MANIFEST_NAME)
+        self.swap(self.staging_dir, self.previous_dir, names)
+        shutil.rmtree(self.staging_dir)
+        self.lock.release()
+
+    def abort(self):
+        if os.path.exists(self.staging_dir):
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+        self.lock.release()
+
+    def rollback(self):
+        """Volta para a geração anterior; a atual passa a ser a anterior."""
+        if not os.path.isdir(self.previous_dir):
+            raise FileNotFoundError("Não há uma instalação anterior para restaurar")
+
+        with self.lock:
+            if os.path.exists(self.staging_dir):
+                shutil.rmtree(self.staging_dir, ignore_errors=True)
+            os.makedirs(self.staging_dir)
+
+            names = sorted(os.listdir(self.previous_dir), key=lambda name: name == MANIFEST_NAME)
+            self.swap(self.previous_dir, self.staging_dir, names)
+
+            shutil.rmtree(self.previous_dir)
+            os.replace(self.staging_dir, self.previous_dir)
@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import errno
+import shutil
+import threading
+from contextlib import contextmanager
+from .manifest import Manifest
+from .staging import PREVIOUS_NAME
+from .utils import FileLock, store_path
+
+# Só os arquivos que o jogo nunca altera no lugar podem ser compartilhados entre perfis;
+# configurações como options.txt são reescritas pelo próprio Minecraft
+STORE_FOLDERS = ("mods/", "shaderpacks/")
+# ioctl FICLONE do Linux (Btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+
+def reflink(source, destination):
+    """Cria `destination` como cópia sob demanda (copy-on-write) de `source`."""
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            if os.path.exists(destination):
+                os.remove(destination)
+            raise
+
+    elif sys.platform == "darwin":
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+
+        # clonefile(2) do APFS
+        if libc.clonefile(os.fsencode(source), os.fsencode(destination), 0) != 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), destination)
+
+    else:
+        raise OSError(errno.EOPNOTSUPP, "Cópia sob demanda não suportada", destination)
+
+
+class ModStore:
+    """Loja de arquivos do modpack endereçada pelo conteúdo e compartilhada entre perfis.
+
+    Cada arquivo de `STORE_FOLDERS` extraído em um perfil entra na loja como
+    `objects/<sha[:2]>/<sha>` sem ser copiado: o objeto é um reflink ou um hardlink
+    do arquivo recém-gravado. Os próximos perfis recebem o mesmo conteúdo pelo meio
+    mais barato disponível (reflink, hardlink ou, em último caso, cópia), sem
+    descomprimir nada. O índice associa o CRC32 e o tamanho do membro no ZIP ao
+    SHA-256, já que é isso que se sabe de um membro antes de extraí-lo.
+
+    A loja nunca é a única cópia de um arquivo instalado, então apagá-la ou coletar
+    objetos não quebra nenhum perfil; no pior caso, o próximo perfil extrai de novo.
+
+    Como outros processos usam a mesma loja, o índice é relido e gravado com
+    `index.lock` travado; os membros guardados desde a última gravação entram nele ali.
+    """
+
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or store_path()
+        self.lock = threading.Lock()
+        self.index_lock = FileLock(os.path.join(self.store_dir, "index.lock"))
+        # Membros guardados por este processo e ainda não gravados no índice
+        self.added = {}
+        # None até a primeira tentativa; False depois que o sistema de arquivos recusar
+        self.reflinks = None
+        self.devices = {}
+
+        os.makedirs(os.path.join(self.store_dir, "objects"), exist_ok=True)
+        self.device = os.stat(self.store_dir).st_dev
+        self.index = self.load_index()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.store_dir, "index.json")
+
+    def load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            index = {}
+
+        index.setdefault("profiles", [])
+        index.setdefault("members", {})
+        return index
+
+    @contextmanager
+    def update(self):
+        """Relê o índice com ele travado entre processos e o grava de volta ao sair."""
+        with self.lock, self.index_lock:
+            self.index = self.load_index()
+            self.index["members"].update(self.added)
+            self.added = {}
+
+            yield self.index
+
+            temp_path = self.index_path + ".tmp"
+
+            with open(temp_path, "w", encoding="utf-8") as file:
+                json.dump(self.index, file, indent=1, sort_keys=True)
+
+            os.replace(temp_path, self.index_path)
+
+    def save(self):
+        with self.update():
+            pass
+
+    def object_path(self, digest):
+        return os.path.join(self.store_dir, "objects", digest[:2], digest)
+
+    def accepts(self, name, destination):
+        """Retorna True se `name` é compartilhável e `destination` está no mesmo volume da loja."""
+        if not name.startswith(STORE_FOLDERS):
+            return False
+
+        directory = os.path.dirname(destination)
+
+        with self.lock:
+            if directory not in self.devices:
+                try:
+                    self.devices[directory] = os.stat(directory).st_dev == self.device
+                except OSError:
+                    return False
+
+            return self.devices[directory]
+
+    def clone(self, source, destination, allow_copy=True):
+        """Cria `destination` com o conteúdo de `source` sem duplicar dados, se possível.
+
+        Retorna o meio usado (`reflink`, `hardlink` ou `cópia`), ou None se só restava
+        copiar e `allow_copy` é falso.
+        """
+        if self.reflinks is not False:
+            try:
+                reflink(source, destination)
+                self.reflinks = True
+                return "reflink"
+            except OSError as error:
+                if error.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.EXDEV, errno.ENOSYS):
+                    self.reflinks = False
+
+        try:
+            os.link(source, destination)
+            return "hardlink"
+        except OSError:
+            # Sistemas de arquivos sem hardlink (FAT32, exFAT) ou limite de links atingido
+            if not allow_copy:
+                return None
+
+        shutil.copyfile(source, destination)
+        return "cópia"
+
+    def place(self, name, crc, size, destination, digest=None):
+        """Coloca em `destination` o objeto do membro `crc`/`size`. Retorna seu SHA-256 ou None.
+
+        Com `digest`, só um objeto com esse SHA-256 serve.
+        """
+        if not self.accepts(name, destination):
+            return None
+
+        with self.lock:
+            found = self.index["members"].get(f"{crc:08x}-{size}")
+
+        if found is None or digest not in (None, found):
+            return None
+
+        digest = found
+        object_path = self.object_path(digest)
+
+        try:
+            if os.path.getsize(object_path) != size:
+                return None
+        except OSError:
+            return None
+
+        temp_path = destination + ".part"
+
+        if os.path.lexists(temp_path):
+            os.remove(temp_path)
+
+        try:
+            self.clone(object_path, temp_path)
+            os.replace(temp_path, destination)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return None
+
+        return digest
+
+    def add(self, name, crc, size, digest, path):
+        """Guarda na loja o arquivo já gravado em `path`, se ainda não houver um objeto igual."""
+        if not self.accepts(name, path):
+            return
+
+        object_path = self.object_path(digest)
+
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_path = f"{object_path}.{threading.get_ident()}.tmp"
+
+            try:
+                # Uma cópia de verdade só duplicaria os dados: nesse caso a loja fica de fora
+                if self.clone(path, temp_path, allow_copy=False) is None:
+                    return
+                os.replace(temp_path, object_path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+
+        with self.lock:
+            self.index["members"][f"{crc:08x}-{size}"] = digest
+            self.added[f"{crc:08x}-{size}"] = digest
+
+    def discard(self, digest):
+        """Remove um objeto que se mostrou corrompido, por exemplo editado no lugar por um hardlink."""
+        path = self.object_path(digest)
+
+        if os.path.exists(path):
+            os.remove(path)
+
+        with self.update() as index:
+            index["members"] = {key: found for key, found in index["members"].items() if found != digest}
+
+    def register(self, dest_dir):
+        """Registra um perfil cujos manifestos mantêm seus objetos vivos na coleta."""
+        dest_dir = os.path.abspath(dest_dir)
+
+        with self.update() as index:
+            if dest_dir not in index["profiles"]:
+                index["profiles"].append(dest_dir)
+
+    def referenced(self):
+        """Retorna os SHA-256 usados pelos perfis registrados, incluindo a geração anterior."""
+        digests = set()
+
+        with self.update() as index:
+            index["profiles"] = [dest_dir for dest_dir in index["profiles"] if os.path.isdir(dest_dir)]
+            profiles = list(index["profiles"])
+
+        for dest_dir in profiles:
+            for directory in (dest_dir, os.path.join(dest_dir, PREVIOUS_NAME)):
+                manifest = Manifest.load(directory)
+
+                if manifest is not None:
+                    digests.update(entry.get("sha256") for entry in manifest.files.values())
+
+        return digests
+
+    def collect(self):
+        """Remove os objetos que nenhum perfil registrado usa. Retorna `(objetos, bytes)` liberados.
+
+        Um objeto com outros hardlinks continua em algum diretório fora do registro e
+        apagá-lo não liberaria espaço, então ele fica.
+        """
+        referenced = self.referenced()
+        objects_dir = os.path.join(self.store_dir, "objects")
+        removed = 0
+        freed = 0
+
+        for prefix in os.listdir(objects_dir):
+            directory = os.path.join(objects_dir, prefix)
+
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                stat = os.stat(path)
+
+                # Restos de uma gravação interrompida
+                if name.endswith(".tmp"):
+                    os.remove(path)
+                    continue
+
+                if name in referenced or stat.st_nlink > 1:
+                    continue
+
+                os.remove(path)
+                removed += 1
+                freed += stat.st_size
+
+            if not os.listdir(directory):
+                os.rmdir(directory)
+
+        with self.update() as index:
+            index["members"] = {
+                key: digest for key, digest in index["members"].items() if os.path.exists(self.object_path(digest))
+            }
+
+        return removed, freed
@@ -0,0 +1,207 @@
+import struct
+import asyncio
+from .extract import member_destination
+from .network import parse_content_range
+from .transport import BUFFER_SIZE
+
+# O diretório central costuma caber aqui; se não couber, ele é pedido à parte
+TAIL_SIZE = 64 * 1024
+# Membros separados por menos que isso vêm na mesma requisição: a ida e volta custa mais que os bytes
+MERGE_GAP = 256 * 1024
+# Abaixo dessa economia, o arquivo completo (que fica no cache para qualquer escolha) é melhor
+MIN_SAVING = 0.1
+
+END_RECORD = struct.Struct("<4s4H2LH")
+CENTRAL_RECORD = struct.Struct("<4s6H3L5H2L")
+END_SIGNATURE = b"PK\x05\x06"
+CENTRAL_SIGNATURE = b"PK\x01\x02"
+# Posição do deslocamento do cabeçalho local dentro de um registro do diretório central
+OFFSET_FIELD = 42
+
+
+class SubsetUnavailable(Exception):
+    pass
+
+
+async def request_range(pool, url, start, end, validator):
+    response = await pool.request("GET", url, {"Range": f"bytes={start}-{end}", "If-Range": validator})
+
+    if response.status != 206 or parse_content_range(response.headers.get("Content-Range"))[0] != start:
+        response.close()
+        # Faixas ignoradas, ou o arquivo mudou desde o HEAD
+        raise SubsetUnavailable(f"Faixa recusada pelo servidor: HTTP {response.status}")
+
+    return response
+
+
+async def read_into(response, size, write):
+    while size > 0:
+        data = await response.read(min(BUFFER_SIZE, size))
+
+        if not data:
+            raise ConnectionError("Conexão encerrada no meio da resposta")
+
+        write(data)
+        size -= len(data)
+
+
+def parse_central_directory(data, count):
+    """Retorna `(deslocamento_local, nome, registro)` de cada membro do diretório central."""
+    entries = []
+    position = 0
+
+    for _ in range(count):
+        if data[position : position + 4] != CENTRAL_SIGNATURE:
+            raise SubsetUnavailable("Diretório central do ZIP inválido")
+
+        fields = CENTRAL_RECORD.unpack_from(data, position)
+        flags, compressed_size, size = fields[3], fields[8], fields[9]
+        name_length, extra_length, comment_length, offset = fields[10], fields[11], fields[12], fields[16]
+
+        if 0xFFFFFFFF in (compressed_size, size, offset):
+            raise SubsetUnavailable("ZIP64 não suportado")
+
+        start = position + CENTRAL_RECORD.size
+        name = bytes(data[start : start + name_length]).decode("utf-8" if flags & 0x800 else "cp437")
+        end = start + name_length + extra_length + comment_length
+        entries.append((offset, name, bytearray(data[position:end])))
+        position = end
+
+    return entries
+
+
+async def fetch_subset(pool, url, path, wanted, connections=1, on_progress=None):
+    """Monta em `path` um ZIP só com os membros do ZIP remoto `url` aceitos por `wanted(caminho)`.
+
+    O diretório central é lido do fim do arquivo com uma faixa de bytes, e cada
+    membro escolhido (cabeçalho local, dados e descritor) é copiado como está, sem
+    descomprimir, em até `connections` requisições simultâneas. O resultado é um ZIP
+    válido, com o diretório central refeito para as novas posições, que a extração
+    normal usa como se fosse o arquivo completo. Todas as faixas levam `If-Range`,
+    então um arquivo que muda no meio não mistura revisões.
+
+    Retorna `(etag, last_modified, bytes_baixados)`. Lança `SubsetUnavailable` se o
+    servidor não aceitar faixas, o ZIP for Zip64 ou a economia não compensar.
+    """
+    on_progress = on_progress or (lambda done, total: None)
+    head = await pool.request("HEAD", url)
+    etag, last_modified = head.headers.get("ETag"), head.headers.get("Last-Modified")
+    validator = etag or last_modified
+    size = int(head.headers.get("Content-Length") or 0)
+
+    if head.status != 200 or head.headers.get("Accept-Ranges") != "bytes" or not size or not validator:
+        raise SubsetUnavailable("Servidor sem suporte a faixas de bytes")
+
+    tail_start = max(size - TAIL_SIZE, 0)
+    tail = bytearray()
+    response = await request_range(pool, url, tail_start, size - 1, validator)
+
+    try:
+        await read_into(response, size - tail_start, tail.extend)
+    finally:
+        response.close()
+
+    position = tail.rfind(END_SIGNATURE)
+    if position < 0 or position + END_RECORD.size > len(tail):
+        raise SubsetUnavailable("Fim do ZIP não encontrado")
+
+    _, _, _, _, count, central_size, central_offset, _ = END_RECORD.unpack_from(tail, position)
+    if count == 0xFFFF or central_offset == 0xFFFFFFFF:
+        raise SubsetUnavailable("ZIP64 não suportado")
+
+    if central_offset >= tail_start:
+        central = tail[central_offset - tail_start : central_offset - tail_start + central_size]
+    else:
+        central = bytearray()
+        response = await request_range(pool, url, central_offset, central_offset + central_size - 1, validator)
+
+        try:
+            await read_into(response, central_size, central.extend)
+        finally:
+            response.close()
+
+    entries = sorted(parse_central_directory(central, count))
+    fetched = len(tail) + (0 if central_offset >= tail_start else central_size)
+    # Cada membro vai do seu cabeçalho local até o início do próximo (ou do diretório central)
+    spans = []
+
+    for index, (offset, name, record) in enumerate(entries):
+        end = entries[index + 1][0] if index + 1 < len(entries) else central_offset
+        member_path = member_destination(name)
+
+        if name.endswith("/") or not member_path or wanted(member_path):
+            spans.append([offset, end, record])
+
+    if sum(end - start for start, end, _ in spans) > (1 - MIN_SAVING) * size:
+        raise SubsetUnavailable("Os componentes escolhidos são quase o arquivo inteiro")
+
+    # No ZIP novo os membros escolhidos ficam lado a lado, na mesma ordem
+    new_size = 0
+    for span in spans:
+        span.append(new_size)
+        new_size += span[1] - span[0]
+
+    groups = []
+    for span in spans:
+        if groups and span[0] - groups[-1][-1][1] <= MERGE_GAP:
+            groups[-1].append(span)
+        else:
+            groups.append([span])
+
+    total = fetched + sum(group[-1][1] - group[0][0] for group in groups)
+    queue = asyncio.Queue()
+    for group in groups:
+        queue.put_nowait(group)
+
+    def writer_at(file, target):
+        def write(data):
+            nonlocal target, fetched
+            file.seek(target)
+            file.write(data)
+            target += len(data)
+            fetched += len(data)
+            on_progress(fetched, total)
+
+        return write
+
+    def discard(data):
+        nonlocal fetched
+        fetched += len(data)
+        on_progress(fetched, total)
+
+    async def worker(file):
+        while not queue.empty():
+            group = queue.get_nowait()
+            response = await request_range(pool, url, group[0][0], group[-1][1] - 1, validator)
+
+            try:
+                position = group[0][0]
+
+                for start, end, _, target in group:
+                    await read_into(response, start - position, discard)
+                    await read_into(response, end - start, writer_at(file, target))
+                    position = end
+            finally:
+                response.close()
+
+    with open(path, "wb") as file:
+        tasks = [asyncio.ensure_future(worker(file)) for _ in range(max(min(connections, len(groups)), 1))]
+
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        file.seek(new_size)
+
+        for _, _, record, target in spans:
+            struct.pack_into("<L", record, OFFSET_FIELD, target)
+            file.write(record)
+
+        central_size = file.tell() - new_size
+        file.write(END_RECORD.pack(END_SIGNATURE, 0, 0, len(spans), len(spans), central_size, new_size, 0))
+
+    return etag, last_modified, fetched
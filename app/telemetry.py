@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import threading
+import statistics
+from contextlib import contextmanager
+from .utils import cache_path
+
+LOG_NAME = "telemetry.jsonl"
+MAX_LOG_SIZE = 1024**2
+LOG_BACKUPS = 3
+# Liga o cProfile e o tracemalloc também na interface gráfica, que não recebe argumentos
+PROFILE_ENV = "MODPACK_UPDATER_PROFILE"
+PROFILE_TOP = 15
+
+
+class Telemetry:
+    """Registro estruturado das etapas de instalação em um log JSON Lines rotativo.
+
+    Cada etapa gera um evento `phase_start` e um `phase_end`, com duração de parede
+    e de CPU, bytes e velocidade quando informados e o erro, se houver. O log passa
+    para `telemetry.jsonl.1` (e assim por diante, até `LOG_BACKUPS`) ao atingir
+    `MAX_LOG_SIZE`. Com `profile`, a etapa mais externa de cada thread também é
+    medida com o cProfile e o tracemalloc, uma de cada vez. Falhas ao gravar o log
+    nunca interrompem a instalação.
+    """
+
+    def __init__(self, log_dir=None, profile=None):
+        self.log_dir = log_dir or os.path.join(cache_path(), "logs")
+        self.profile = bool(os.environ.get(PROFILE_ENV)) if profile is None else profile
+        self.run = uuid.uuid4().hex[:12]
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.profiling = False
+        self.captures = 0
+
+    @property
+    def path(self):
+        return os.path.join(self.log_dir, LOG_NAME)
+
+    def rotate(self):
+        for number in range(LOG_BACKUPS - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+
+        os.replace(self.path, f"{self.path}.1")
+
+    def event(self, name, **fields):
+        record = {"time": time.time(), "run": self.run, "event": name, **fields}
+
+        try:
+            with self.lock:
+                os.makedirs(self.log_dir, exist_ok=True)
+
+                if os.path.exists(self.path) and os.path.getsize(self.path) >= MAX_LOG_SIZE:
+                    self.rotate()
+
+                with open(self.path, "a", encoding="utf-8") as file:
+                    file.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        except OSError:
+            pass
+
+    @contextmanager
+    def phase(self, name, **fields):
+        """Mede a etapa `name`; o dicionário entregue recebe campos extras como `bytes`."""
+        info = dict(fields)
+        depth = getattr(self.local, "depth", 0)
+        capture = self.start_capture() if self.profile and depth == 0 else None
+
+        self.event("phase_start", phase=name, **fields)
+        self.local.depth = depth + 1
+        started, cpu = time.perf_counter(), time.thread_time()
+
+        try:
+            yield info
+        except BaseException as error:
+            info["error"] = f"{type(error).__name__}: {error}"
+            raise
+        finally:
+            wall = time.perf_counter() - started
+            info.update(wall=wall, cpu=time.thread_time() - cpu)
+
+            if info.get("bytes") and wall > 0:
+                info["throughput"] = info["bytes"] / wall
+
+            self.local.depth = depth
+            self.event("phase_end", phase=name, **info)
+
+            if capture is not None:
+                self.stop_capture(name, *capture)
+
+    def start_capture(self):
+        with self.lock:
+            # Só um perfilador pode estar ativo no processo
+            if self.profiling:
+                return None
+            self.profiling = True
+
+        import cProfile
+        import tracemalloc
+
+        tracemalloc.start()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, tracemalloc
+
+    def stop_capture(self, name, profiler, tracemalloc):
+        """Grava o perfil em um `.prof` e registra as funções e alocações mais pesadas."""
+        import pstats
+
+        profiler.disable()
+        _, peak = tracemalloc.get_traced_memory()
+        allocations = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_TOP]
+        tracemalloc.stop()
+
+        self.captures += 1
+        profile_path = os.path.join(self.log_dir, f"{self.run}-{self.captures}-{name}.prof")
+        stats = pstats.Stats(profiler)
+
+        try:
+            os.makedirs(self.log_dir, exist_ok=True)
+            stats.dump_stats(profile_path)
+        except OSError:
+            profile_path = None
+
+        functions = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:PROFILE_TOP]
+        self.event(
+            "profile",
+            phase=name,
+            path=profile_path,
+            peak_memory=peak,
+            functions=[
+                {"function": pstats.func_std_string(function), "calls": calls, "cumulative": cumulative}
+                for function, (_, calls, _, cumulative, _) in functions
+            ],
+            allocations=[{"line": str(stat.traceback), "size": stat.size, "count": stat.count} for stat in allocations],
+            # O cProfile só enxerga a thread que iniciou a etapa
+            note="apenas a thread da etapa",
+        )
+
+        with self.lock:
+            self.profiling = False
+
+
+def read_events(log_dir=None):
+    """Lê os eventos do log e das cópias rotacionadas, dos mais antigos aos mais novos."""
+    path = os.path.join(log_dir or os.path.join(cache_path(), "logs"), LOG_NAME)
+    events = []
+
+    for number in range(LOG_BACKUPS, -1, -1):
+        try:
+            with open(f"{path}.{number}" if number else path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        events.append(json.loads(line))
+                    except ValueError:
+                        # Linha cortada por uma gravação interrompida
+                        continue
+        except OSError:
+            continue
+
+    return events
+
+
+def summarize(events, runs=None):
+    """Agrupa as etapas concluídas por nome, das mais lentas (pela mediana) às mais rápidas.
+
+    Com `runs`, considera só as últimas `runs` execuções.
+    """
+    if runs:
+        recent = list(dict.fromkeys(event["run"] for event in events))[-runs:]
+        events = [event for event in events if event["run"] in recent]
+
+    phases = {}
+    retries = {}
+
+    for event in events:
+        if event.get("event") == "phase_end":
+            phases.setdefault(event["phase"], []).append(event)
+        elif event.get("event") == "retry":
+            retries[event["phase"]] = retries.get(event["phase"], 0) + 1
+
+    summary = []
+
+    for name, ends in phases.items():
+        walls = [end["wall"] for end in ends]
+        rates = [end["throughput"] for end in ends if end.get("throughput")]
+        summary.append(
+            {
+                "phase": name,
+                "count": len(ends),
+                "median": statistics.median(walls),
+                "max": max(walls),
+                "throughput": statistics.median(rates) if rates else None,
+                "retries": retries.get(name, 0),
+                "errors": sum(1 for end in ends if end.get("error")),
+            }
+        )
+
+    return sorted(summary, key=lambda row: row["median"], reverse=True)
+
+
+def format_report(summary, events):
+    header = f"{'etapa':<22}{'vezes':>7}{'mediana':>10}{'máx':>10}{'MB/s':>8}{'novas tentativas':>18}{'erros':>7}"
+    lines = [header, "-" * len(header)]
+
+    for row in summary:
+        rate = f"{row['throughput'] / 1024**2:>8.1f}" if row["throughput"] else f"{'-':>8}"
+        lines.append(
+            f"{row['phase']:<22}{row['count']:>7}{row['median']:>9.2f}s{row['max']:>9.2f}s{rate}"
+            f"{row['retries']:>18}{row['errors']:>7}"
+        )
+
+    errors = [event for event in events if event.get("event") == "phase_end" and event.get("error")]
+
+    if errors:
+        lines.append("\nÚltimos erros:")
+
+        for event in errors[-5:]:
+            moment = time.strftime("%Y-%m-%d %H:%M", time.localtime(event["time"]))
+            lines.append(f"  {moment} {event['phase']}: {event['error']}")
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m app.telemetry", description="Resume as etapas mais lentas das últimas instalações."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    report = commands.add_parser("report", help="mostra o tempo de cada etapa nas execuções registradas")
+    report.add_argument("--last", type=int, metavar="N", help="considera só as últimas N execuções")
+    report.add_argument("--log-dir", help="diretório do log (padrão: cache do instalador)")
+    args = parser.parse_args(argv)
+
+    events = read_events(args.log_dir)
+
+    if not events:
+        print("Nenhum evento registrado.")
+        return 0
+
+    print(format_report(summarize(events, args.last), events))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,627 @@
+import ssl
+import json
+import time
+import asyncio
+import http.client
+from io import BytesIO
+from urllib.parse import urljoin, urlparse
+from .network import (
+    HEADERS,
+    REDIRECTS,
+    RETRIES,
+    SEGMENT_MIN_SIZE,
+    SEGMENTS_PER_CONNECTION,
+    TIMEOUT,
+    contiguous_size,
+    parse_content_range,
+)
+
+BUFFER_SIZE = 64 * 1024
+# Só depois desse tempo a velocidade medida de uma transferência é levada a sério
+SLOW_GRACE = 3.0
+# Um espelho abaixo dessa fração da velocidade do melhor alternativo é abandonado
+SLOW_RATIO = 0.25
+# Tamanho usado para comparar espelhos de latência e velocidade diferentes
+REFERENCE_SIZE = 8 * 1024**2
+# Velocidade assumida para um espelho que ainda não foi medido
+UNKNOWN_THROUGHPUT = 1024**2
+SMOOTHING = 0.3
+
+
+class MirrorSlow(ConnectionError):
+    pass
+
+
+class Connection:
+    """Uma conexão HTTP/1.1 aberta, com tempo limite em cada leitura e limite de banda opcional."""
+
+    def __init__(self, key, reader, writer, timeout, limiter=None):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.timeout = timeout
+        self.limiter = limiter
+
+    async def readline(self):
+        return await asyncio.wait_for(self.reader.readline(), self.timeout)
+
+    async def read(self, size):
+        data = await asyncio.wait_for(self.reader.read(size), self.timeout)
+
+        if self.limiter is not None and data:
+            delay = self.limiter.reserve(len(data))
+
+            if delay:
+                await asyncio.sleep(delay)
+
+        return data
+
+    async def readexactly(self, size):
+        try:
+            return await asyncio.wait_for(self.reader.readexactly(size), self.timeout)
+        except asyncio.IncompleteReadError:
+            raise ConnectionError("Conexão encerrada no meio da resposta")
+
+    def close(self):
+        self.writer.close()
+
+
+class Response:
+    """Resposta HTTP lida sob demanda. Ao fim do corpo, a conexão volta para o pool."""
+
+    def __init__(self, pool, connection, method, status, reason, headers):
+        self.pool = pool
+        self.connection = connection
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+
+        length = headers.get("Content-Length")
+        self.chunked = "chunked" in headers.get("Transfer-Encoding", "").lower()
+        self.remaining = int(length) if length is not None and not self.chunked else None
+        self.chunk_left = 0
+        self.will_close = headers.get("Connection", "").lower() == "close" or (
+            self.remaining is None and not self.chunked
+        )
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            self.remaining, self.chunked = 0, False
+            self.will_close = headers.get("Connection", "").lower() == "close"
+
+        self.done = False
+        if self.remaining == 0:
+            self.finish()
+
+    async def read(self, size=BUFFER_SIZE):
+        if self.done:
+            return b""
+
+        if self.chunked:
+            if self.chunk_left == 0:
+                line = await self.connection.readline()
+
+                try:
+                    self.chunk_left = int(line.split(b";")[0].strip(), 16)
+                except ValueError:
+                    raise ConnectionError("Resposta em blocos inválida")
+
+                if self.chunk_left == 0:
+                    while (await self.connection.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    self.finish()
+                    return b""
+
+            data = await self.connection.read(min(size, self.chunk_left))
+            if not data:
+                raise ConnectionError("Conexão encerrada no meio da resposta")
+
+            self.chunk_left -= len(data)
+            if self.chunk_left == 0:
+                await self.connection.readexactly(2)
+
+            return data
+
+        if self.remaining is None:
+            # Sem tamanho nem blocos, o corpo termina quando o servidor fecha a conexão
+            data = await self.connection.read(size)
+            if not data:
+                self.finish()
+            return data
+
+        data = await self.connection.read(min(size, self.remaining))
+        if not data:
+            raise ConnectionError("Conexão encerrada no meio da resposta")
+
+        self.remaining -= len(data)
+        if self.remaining == 0:
+            self.finish()
+
+        return data
+
+    def finish(self):
+        self.done = True
+        self.pool.release(self.connection, not self.will_close)
+
+    def close(self):
+        """Descarta o resto da resposta; a conexão só é reaproveitada se o corpo foi lido até o fim."""
+        if not self.done:
+            self.done = True
+            self.connection.close()
+
+
+class ConnectionPool:
+    """Conexões HTTP/1.1 persistentes por servidor, reaproveitadas entre requisições.
+
+    Com `limiter` (`TokenBucket`), todas as conexões do pool dividem o mesmo limite de banda.
+    """
+
+    def __init__(self, timeout=TIMEOUT, limiter=None):
+        self.timeout = timeout
+        self.limiter = limiter
+        self.idle = {}
+        self.ssl_context = None
+
+    async def connect(self, parsed_url):
+        secure = parsed_url.scheme == "https"
+        port = parsed_url.port or (443 if secure else 80)
+        key = (parsed_url.scheme, parsed_url.hostname, port)
+        idle = self.idle.get(key, [])
+
+        while idle:
+            connection = idle.pop()
+
+            if not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+
+        if secure and self.ssl_context is None:
+            self.ssl_context = ssl.create_default_context()
+
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parsed_url.hostname, port, ssl=self.ssl_context if secure else None),
+            self.timeout,
+        )
+        return Connection(key, reader, writer, self.timeout, self.limiter), False
+
+    async def request(self, method, url, headers=None):
+        """Envia a requisição seguindo até `REDIRECTS` redirecionamentos, como `download_file`.
+
+        Espelhos como os assets de uma release do GitHub respondem com um redirecionamento
+        para um endereço temporário, que precisa ser seguido a cada requisição.
+        """
+        for _ in range(REDIRECTS + 1):
+            response = await self.send(method, url, headers)
+
+            if response.status not in (301, 302, 303, 307, 308) or not response.headers.get("Location"):
+                return response
+
+            response.close()
+            url = urljoin(url, response.headers["Location"])
+
+        raise ConnectionError(f"Redirecionamentos demais ao acessar {url}")
+
+    async def send(self, method, url, headers=None):
+        parsed_url = urlparse(url)
+        target = (parsed_url.path or "/") + (f"?{parsed_url.query}" if parsed_url.query else "")
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {parsed_url.netloc}"]
+        lines += [f"{name}: {value}" for name, value in {**HEADERS, **(headers or {})}.items()]
+        request = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+        for attempt in range(2):
+            connection, reused = await self.connect(parsed_url)
+
+            try:
+                connection.writer.write(request)
+                await connection.writer.drain()
+
+                status_line = await connection.readline()
+                if not status_line:
+                    raise ConnectionError("Conexão encerrada pelo servidor")
+
+                parts = status_line.decode("latin-1").rstrip("\r\n").split(" ", 2)
+                if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+                    raise ConnectionError(f"Resposta HTTP inválida: {status_line[:80]!r}")
+
+                header_lines = []
+                while (line := await connection.readline()) not in (b"\r\n", b"\n", b""):
+                    header_lines.append(line)
+
+                response_headers = http.client.parse_headers(BytesIO(b"".join(header_lines) + b"\r\n"))
+
+            except (OSError, asyncio.TimeoutError):
+                connection.close()
+
+                # Uma conexão ociosa pode ter sido fechada pelo servidor: tenta uma nova, uma vez
+                if reused and attempt == 0:
+                    continue
+                raise
+
+            except BaseException:
+                connection.close()
+                raise
+
+            reason = parts[2] if len(parts) > 2 else ""
+            return Response(self, connection, method, int(parts[1]), reason, response_headers)
+
+    def release(self, connection, reusable):
+        if reusable:
+            self.idle.setdefault(connection.key, []).append(connection)
+        else:
+            connection.close()
+
+    def close(self):
+        for connections in self.idle.values():
+            for connection in connections:
+                connection.close()
+        self.idle.clear()
+
+
+class Mirror:
+    """Um endereço do arquivo do modpack e as medidas de latência e velocidade dele."""
+
+    def __init__(self, url, latency=None, throughput=None, failures=0):
+        self.url = url
+        self.latency = latency
+        self.throughput = throughput
+        self.failures = failures
+
+    def record_latency(self, seconds):
+        self.latency = seconds if self.latency is None else self.latency + SMOOTHING * (seconds - self.latency)
+
+    def record_transfer(self, size, seconds):
+        if seconds <= 0 or size <= 0:
+            return
+
+        rate = size / seconds
+        self.throughput = rate if self.throughput is None else self.throughput + SMOOTHING * (rate - self.throughput)
+
+    def record_success(self):
+        self.failures = max(self.failures - 1, 0)
+
+    def record_failure(self):
+        self.failures += 1
+
+    def score(self):
+        """Tempo estimado para baixar `REFERENCE_SIZE` bytes, penalizado pelas falhas recentes."""
+        latency = self.latency if self.latency is not None else 0.0
+        throughput = self.throughput or UNKNOWN_THROUGHPUT
+        return (latency + REFERENCE_SIZE / throughput) * (1 + self.failures) ** 2
+
+
+class MirrorSet:
+    """Espelhos do mesmo arquivo, ordenados pelas medidas de uso anteriores.
+
+    As medidas são gravadas em `path` para que a próxima execução já comece pelo
+    espelho mais rápido.
+    """
+
+    def __init__(self, urls, path=None):
+        self.path = path
+        stats = {}
+
+        if path is not None:
+            try:
+                with open(path, "r", encoding="utf-8") as file:
+                    stats = json.load(file)
+            except (OSError, ValueError):
+                stats = {}
+
+        self.mirrors = [Mirror(url, **stats.get(url, {})) for url in dict.fromkeys(urls)]
+
+    def ranked(self, mirrors=None):
+        mirrors = self.mirrors if mirrors is None else mirrors
+        # `sorted` é estável: sem medidas, vale a ordem configurada
+        return sorted(mirrors, key=Mirror.score)
+
+    def fastest_other(self, mirror):
+        rates = [other.throughput for other in self.mirrors if other is not mirror and other.throughput]
+        return max(rates, default=None)
+
+    def save(self):
+        if self.path is None:
+            return
+
+        stats = {
+            mirror.url: {"latency": mirror.latency, "throughput": mirror.throughput, "failures": mirror.failures}
+            for mirror in self.mirrors
+        }
+
+        try:
+            with open(self.path, "w", encoding="utf-8") as file:
+                json.dump(stats, file)
+        except OSError:
+            pass
+
+    async def probe(self, pool, headers=None):
+        """Faz um HEAD em todos os espelhos ao mesmo tempo e retorna `espelho -> resposta`."""
+
+        async def head(mirror):
+            started = time.monotonic()
+
+            try:
+                response = await pool.request("HEAD", mirror.url, headers)
+            except (OSError, asyncio.TimeoutError):
+                mirror.record_failure()
+                return None
+
+            mirror.record_latency(time.monotonic() - started)
+
+            # 405: o espelho não aceita HEAD, mas pode servir o GET
+            if response.status not in (200, 206, 304, 405):
+                mirror.record_failure()
+                return None
+
+            return response
+
+        responses = await asyncio.gather(*(head(mirror) for mirror in self.mirrors))
+        return {mirror: response for mirror, response in zip(self.mirrors, responses) if response is not None}
+
+
+class MirroredDownload:
+    """Baixa o arquivo do modpack para um `CacheWriter` a partir dos espelhos disponíveis.
+
+    Com faixas de bytes, o arquivo é dividido em segmentos buscados por
+    `connections` tarefas, cada uma pegando o próximo segmento no melhor espelho
+    naquele momento; um espelho que falha ou fica lento perde a vez e o segmento
+    continua de onde parou em outro. Sem faixas, o download é sequencial no melhor
+    espelho. `on_progress(bytes_baixados, tamanho_total, rótulo)` é chamado a cada
+    bloco recebido. Com `limiter`, a velocidade é limitada de propósito, então ela
+    não é registrada nos espelhos nem usada para trocar de espelho.
+    """
+
+    def __init__(self, mirrors, temp, connections=1, headers=None, on_progress=None, limiter=None):
+        self.mirrors = mirrors
+        self.temp = temp
+        self.connections = connections
+        self.headers = headers or {}
+        self.on_progress = on_progress or (lambda total_bytes, total_length, label: None)
+        self.limiter = limiter
+        self.pool = ConnectionPool(limiter=limiter)
+
+    async def run(self):
+        try:
+            return await self.attempt()
+        finally:
+            self.pool.close()
+            self.mirrors.save()
+
+    async def attempt(self):
+        if self.connections <= 1 and len(self.mirrors.mirrors) == 1:
+            # Nada a comparar nem a dividir: o HEAD só custaria uma ida e volta
+            return await self.single(self.mirrors.mirrors[0])
+
+        probes = await self.mirrors.probe(self.pool, self.headers)
+        if not probes:
+            raise ConnectionError("Nenhum espelho do modpack respondeu")
+
+        best = next(mirror for mirror in self.mirrors.ranked() if mirror in probes)
+        probe = probes[best]
+
+        if probe.status == 304:
+            return probe
+
+        length = probe.headers.get("Content-Length")
+
+        if (
+            self.connections > 1
+            and probe.status == 200
+            and probe.headers.get("Accept-Ranges") == "bytes"
+            and length is not None
+            and int(length) >= SEGMENT_MIN_SIZE
+        ):
+            # Só espelhos com o mesmo tamanho servem o mesmo arquivo
+            eligible = [
+                mirror
+                for mirror, response in probes.items()
+                if response.status == 200
+                and response.headers.get("Accept-Ranges") == "bytes"
+                and response.headers.get("Content-Length") == length
+            ]
+            return await self.segmented(best, eligible, probes, int(length))
+
+        ranked = self.mirrors.ranked(list(probes))
+
+        for position, mirror in enumerate(ranked):
+            try:
+                return await self.single(mirror)
+            except (OSError, asyncio.TimeoutError):
+                if position == len(ranked) - 1:
+                    raise
+
+    def check_speed(self, mirror, received, started):
+        """Lança `MirrorSlow` se o espelho está bem abaixo da velocidade de outro já medido."""
+        elapsed = time.monotonic() - started
+
+        if elapsed < SLOW_GRACE or self.limiter is not None:
+            return
+
+        fastest = self.mirrors.fastest_other(mirror)
+
+        if fastest and received / elapsed < SLOW_RATIO * fastest:
+            mirror.record_transfer(received, elapsed)
+            raise MirrorSlow(f"Espelho lento ({received / elapsed / 1024**2:.2f} MB/s), trocando de espelho")
+
+    async def single(self, mirror):
+        temp = self.temp
+        started = time.monotonic()
+
+        try:
+            response = await self.pool.request("GET", mirror.url, {**self.headers, **temp.resume_headers()})
+        except (OSError, asyncio.TimeoutError):
+            mirror.record_failure()
+            raise
+
+        mirror.record_latency(time.monotonic() - started)
+
+        try:
+            if response.status == 304:
+                return response
+            if response.status == 416:
+                temp.restart()
+                raise ConnectionError("Faixa de download recusada, reiniciando")
+            if response.status >= 500:
+                raise ConnectionError(f"Erro HTTP {response.status} {response.reason}")
+            if response.status >= 400:
+                raise Exception(f"Erro HTTP {response.status} {response.reason}")
+            if response.status not in (200, 206):
+                # Qualquer outra resposta não traz o arquivo: o próximo espelho é tentado
+                raise ConnectionError(f"Resposta inesperada do espelho: HTTP {response.status} {response.reason}")
+
+            if response.status == 206:
+                offset, total_length = parse_content_range(response.headers.get("Content-Range"))
+
+                if offset != temp.size:
+                    temp.restart()
+                    raise ConnectionError("Faixa de download inesperada, reiniciando")
+                if total_length and not temp.expected_size:
+                    temp.meta["size"] = total_length
+                    temp.save_meta()
+                total_length = total_length or temp.expected_size
+            else:
+                # O servidor ignorou o Range (ou o arquivo mudou): recomeça do zero
+                length = response.headers.get("Content-Length")
+                total_length = int(length) if length is not None else 0
+                temp.restart(response.headers.get("ETag"), response.headers.get("Last-Modified"), total_length)
+
+            total_bytes = temp.size
+            received = 0
+            started = time.monotonic()
+
+            while chunk := await response.read():
+                temp.write(chunk)
+                total_bytes += len(chunk)
+                received += len(chunk)
+                self.on_progress(total_bytes, total_length, "Baixando...")
+                self.check_speed(mirror, received, started)
+
+            if total_length > 0 and total_bytes < total_length:
+                raise ConnectionError(f"Download incompleto: {total_bytes} de {total_length} bytes")
+
+            if self.limiter is None:
+                mirror.record_transfer(received, time.monotonic() - started)
+            mirror.record_success()
+            return response
+
+        except (OSError, asyncio.TimeoutError):
+            mirror.record_failure()
+            raise
+
+        finally:
+            response.close()
+
+    async def segmented(self, best, eligible, probes, size):
+        temp = self.temp
+        probe = probes[best]
+        segments = temp.plan_segments(
+            size,
+            probe.headers.get("ETag"),
+            probe.headers.get("Last-Modified"),
+            self.connections * SEGMENTS_PER_CONNECTION,
+        )
+
+        queue = asyncio.Queue()
+        for segment in segments:
+            if segment[0] + segment[2] <= segment[1]:
+                queue.put_nowait(segment)
+
+        total_bytes = sum(segment[2] for segment in segments)
+        label = f"Baixando ({self.connections} conexões)..."
+        # Falhas toleradas antes de desistir desta tentativa
+        budget = [RETRIES * max(len(eligible), 1)]
+
+        def validator(mirror):
+            headers = probes[mirror].headers
+            return headers.get("ETag") or headers.get("Last-Modified")
+
+        async def fetch_segment(mirror, segment, file):
+            nonlocal total_bytes
+            start, end, done = segment
+            headers = {**HEADERS, "Range": f"bytes={start + done}-{end}"}
+
+            if validator(mirror):
+                headers["If-Range"] = validator(mirror)
+
+            started = time.monotonic()
+            response = await self.pool.request("GET", mirror.url, headers)
+            mirror.record_latency(time.monotonic() - started)
+
+            try:
+                if response.status != 206:
+                    raise ConnectionError(f"Faixa recusada pelo servidor: HTTP {response.status}")
+
+                offset, _ = parse_content_range(response.headers.get("Content-Range"))
+                if offset != start + done:
+                    raise ConnectionError("Faixa de download inesperada")
+
+                received = 0
+                started = time.monotonic()
+
+                while chunk := await response.read():
+                    file.seek(start + segment[2])
+                    file.write(chunk)
+                    segment[2] += len(chunk)
+                    received += len(chunk)
+                    total_bytes += len(chunk)
+
+                    if temp.watcher is not None:
+                        temp.watcher.advance(contiguous_size(segments))
+
+                    self.on_progress(total_bytes, size, label)
+                    self.check_speed(mirror, received, started)
+
+                if start + segment[2] <= end:
+                    raise ConnectionError("Faixa de download incompleta")
+
+                if self.limiter is None:
+                    mirror.record_transfer(received, time.monotonic() - started)
+                mirror.record_success()
+
+            finally:
+                response.close()
+
+        in_flight = {mirror: 0 for mirror in eligible}
+
+        def pick():
+            # Um espelho ainda sem medida recebe um segmento, para poder ser comparado
+            for mirror in eligible:
+                if mirror.throughput is None and mirror.failures == 0 and not in_flight[mirror]:
+                    return mirror
+
+            return self.mirrors.ranked(eligible)[0]
+
+        async def worker(file):
+            while not queue.empty():
+                segment = queue.get_nowait()
+                mirror = pick()
+                in_flight[mirror] += 1
+
+                try:
+                    await fetch_segment(mirror, segment, file)
+                except (OSError, asyncio.TimeoutError):
+                    mirror.record_failure()
+                    budget[0] -= 1
+
+                    # O segmento continua depois, de onde parou, no espelho que estiver melhor
+                    queue.put_nowait(segment)
+
+                    if budget[0] < 0:
+                        raise
+                finally:
+                    in_flight[mirror] -= 1
+
+        # Sem buffer: os bytes ficam visíveis para quem lê o arquivo assim que chegam
+        with open(temp.temp_path, "r+b", buffering=0) as file:
+            tasks = [asyncio.ensure_future(worker(file)) for _ in range(self.connections)]
+
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            finally:
+                temp.save_meta()
+
+        temp.finish_segments()
+        return probe
@@ -1,7 +1,11 @@
 import os
 import sys
+import time
 import platform
 
+# Intervalo entre tentativas de pegar uma trava ocupada por outro processo
+LOCK_POLL = 0.2
+
 
 def default_path():
     """Retorna o caminho padrão do Minecraft baseado no sistema operacional."""
@@ -26,6 +30,114 @@ def resource_path(relative_path):
     try:
         base_path = sys._MEIPASS
     except Exception:
-        base_path = os.path.abspath(".")
+        # Raiz do projeto, para funcionar também quando executado de outro diretório
+        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
     return os.path.join(base_path, os.path.normpath(relative_path))
+
+
+def cache_path():
+    """Retorna o diretório de cache do instalador baseado no sistema operacional."""
+    system = platform.system()
+
+    if system == "Windows":
+        base = os.getenv("LOCALAPPDATA") or os.getenv("APPDATA")
+
+        if not base:
+            raise EnvironmentError("A variável LOCALAPPDATA não está definida.")
+
+        return os.path.join(base, "modpack_updater", "cache")
+
+    elif system == "Darwin":
+        return os.path.expanduser("~/Library/Caches/modpack_updater")
+
+    else:
+        base = os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        return os.path.join(base, "modpack_updater")
+
+
+def store_path():
+    """Retorna o diretório da loja de mods compartilhada entre perfis.
+
+    Fica junto aos dados do usuário, e não no cache, para estar no mesmo volume do
+    diretório padrão do Minecraft e poder receber hardlinks dele.
+    """
+    system = platform.system()
+
+    if system == "Windows":
+        base = os.getenv("LOCALAPPDATA") or os.getenv("APPDATA")
+
+        if not base:
+            raise EnvironmentError("A variável LOCALAPPDATA não está definida.")
+
+        return os.path.join(base, "modpack_updater", "store")
+
+    elif system == "Darwin":
+        return os.path.expanduser("~/Library/Application Support/modpack_updater/store")
+
+    else:
+        base = os.getenv("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+        return os.path.join(base, "modpack_updater", "store")
+
+
+class FileLock:
+    """Trava exclusiva sobre o arquivo `path`, respeitada por todos os processos do instalador.
+
+    Usa `flock` no POSIX e `msvcrt.locking` no Windows; o sistema a libera sozinho
+    se o processo terminar, então uma trava nunca fica presa por uma execução que caiu.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self, blocking=True):
+        """Pega a trava, esperando por ela se `blocking`. Retorna False se estava ocupada."""
+        if self.file is not None:
+            return True
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        file = open(self.path, "a+b")
+
+        while True:
+            try:
+                if sys.platform == "win32":
+                    import msvcrt
+
+                    file.seek(0)
+                    msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    import fcntl
+
+                    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+                self.file = file
+                return True
+
+            except OSError:
+                if not blocking:
+                    file.close()
+                    return False
+
+                time.sleep(LOCK_POLL)
+
+    def release(self):
+        if self.file is None:
+            return
+
+        if sys.platform == "win32":
+            import msvcrt
+
+            self.file.seek(0)
+            msvcrt.locking(self.file.fileno(), msvcrt.LK_UNLCK, 1)
+
+        # No POSIX, fechar o arquivo libera o `flock`
+        self.file.close()
+        self.file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
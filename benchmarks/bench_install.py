@@ -0,0 +1,204 @@
+"""Benchmark das etapas de instalação contra um codeload local.
+
+Cada modo roda em um processo separado, para que o pico de memória (RSS) e o
+tempo de CPU sejam só dele, enquanto o servidor falso fica no processo principal.
+A instalação é a do próprio `Installer.install`, e o tempo de cada etapa vem dos
+eventos de telemetria que ele grava no diretório de trabalho do modo.
+
+    python -m benchmarks.bench_install --size 100 --entries 300 --bandwidth 20 --latency 0.05
+    python -m benchmarks.bench_install --modes sequencial streaming --json resultados.json
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import subprocess
+
+# Como o motor de instalação será configurado em cada modo
+MODES = {
+    "sequencial": {"connections": 1, "streaming": False},
+    "segmentado": {"connections": 4, "streaming": False},
+    "streaming": {"connections": 1, "streaming": True},
+    "segmentado+streaming": {"connections": 4, "streaming": True},
+    # Segunda instalação no mesmo diretório, revalidando o cache (304) e extraindo só o que mudou
+    "reinstalacao": {"connections": 4, "streaming": True, "warm": True, "force": True},
+    # Segunda execução sem nada novo no servidor: só a verificação condicional deve acontecer
+    "sem-mudancas": {"connections": 4, "streaming": True, "warm": True},
+    # Espelho principal instável e um lento na frente do bom: mede a troca de espelho
+    "espelhos": {"connections": 4, "streaming": True, "mirrors": ["instavel", "lento", "principal"]},
+    # Outro perfil já instalado: os mods vêm da loja compartilhada em vez de extraídos
+    "segundo-perfil": {"connections": 4, "streaming": False, "warm": True, "profile": True},
+    # Sem shader: só os mods e configurações são buscados, com faixas de bytes
+    "sem-shader": {"connections": 4, "streaming": False, "shader": "Não"},
+}
+
+SHADER = "ComplementaryUnbound_r5.3"
+PHASES = ["verificar", "preparar", "baixar", "patch", "extrair", "aplicar", "configurar"]
+# Etapas da telemetria contadas junto com outra na tabela
+ALIASES = {"baixar-componentes": "baixar"}
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KiB, macOS em bytes
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def run_install(installer, dest_dir, shader=SHADER, force=False):
+    """Roda `Installer.install` e retorna `etapa -> {"wall", "cpu", "bytes"}` lidos da telemetria."""
+    from app.telemetry import Telemetry, read_events
+
+    # Uma telemetria nova por instalação: o `run` dela separa seus eventos no log
+    installer.telemetry = Telemetry(installer.telemetry.log_dir)
+    installer.install(dest_dir, "Qualidade", shader, "Média", force=force)
+
+    phases = {name: {"wall": 0.0, "cpu": 0.0, "bytes": 0} for name in PHASES}
+
+    for event in read_events(installer.telemetry.log_dir):
+        if event.get("run") != installer.telemetry.run or event.get("event") != "phase_end":
+            continue
+
+        name = ALIASES.get(event["phase"], event["phase"])
+
+        if name in phases:
+            for field in phases[name]:
+                phases[name][field] += event.get(field) or 0
+
+    return phases
+
+
+def run_mode(mode, urls, workdir):
+    """Executa um modo neste processo e retorna as métricas; `urls` mapeia nome do servidor -> URL."""
+    from app.cache import ArchiveCache
+    from app.installer import Installer
+    from app.store import ModStore
+    from app.telemetry import Telemetry
+
+    config = MODES[mode]
+    installer = Installer(
+        cache=ArchiveCache(os.path.join(workdir, "cache")),
+        store=ModStore(os.path.join(workdir, "store")),
+        telemetry=Telemetry(os.path.join(workdir, "logs")),
+    )
+    names = config.get("mirrors", ["principal"])
+    installer.url = urls[names[0]]
+    installer.mirrors = [urls[name] for name in names[1:]]
+    # Sem a API do GitHub, a verificação cai no HEAD condicional ao próprio arquivo
+    installer.revision_url = None
+    # O servidor local não publica patches
+    installer.patch_url = None
+    installer.connections = config["connections"]
+    installer.streaming = config["streaming"]
+    dest_dir = os.path.join(workdir, "minecraft")
+
+    if config.get("warm"):
+        run_install(installer, dest_dir + "-outro" if config.get("profile") else dest_dir)
+        installer.cache.max_age = 0
+
+    started, cpu = time.perf_counter(), time.process_time()
+    phases = run_install(installer, dest_dir, config.get("shader", SHADER), config.get("force", False))
+
+    return {
+        "mode": mode,
+        "phases": phases,
+        "wall": time.perf_counter() - started,
+        "cpu": time.process_time() - cpu,
+        "downloaded_mb": phases["baixar"]["bytes"] / 1024**2,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def format_report(results):
+    header = f"{'modo':<22}" + "".join(f"{phase:>11}" for phase in PHASES)
+    header += f"{'total':>9}{'MB/s':>8}{'CPU s':>8}{'RSS MB':>8}"
+    lines = [header, "-" * len(header)]
+
+    for result in results:
+        download = result["phases"]["baixar"]["wall"]
+        throughput = result["downloaded_mb"] / download if download > 0 else 0
+        rss = result["peak_rss_mb"]
+
+        line = f"{result['mode']:<22}"
+        line += "".join(f"{result['phases'][phase]['wall']:>10.2f}s" for phase in PHASES)
+        line += f"{result['wall']:>8.2f}s{throughput:>8.1f}{result['cpu']:>8.2f}"
+        line += f"{rss:>8.0f}" if rss is not None else f"{'-':>8}"
+        lines.append(line)
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede cada etapa da instalação contra um codeload local.")
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--size", type=float, default=50, help="tamanho aproximado do modpack em MB")
+    parser.add_argument("--entries", type=int, default=200, help="quantidade de mods no ZIP")
+    parser.add_argument("--shader-size", type=float, default=10, help="tamanho do shaderpack em MB")
+    parser.add_argument("--latency", type=float, default=0.0, help="latência por requisição em segundos")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="limite por conexão em MB/s")
+    parser.add_argument("--no-ranges", action="store_true", help="servidor sem suporte a faixas de bytes")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    parser.add_argument("--run-mode", help=argparse.SUPPRESS)
+    parser.add_argument("--urls", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args.run_mode, json.loads(args.urls), args.workdir)))
+        return 0
+
+    from .fake_codeload import FakeCodeload, make_modpack
+
+    with tempfile.TemporaryDirectory() as root:
+        archive_path = os.path.join(root, "modpack.zip")
+        make_modpack(archive_path, args.size, args.entries, shader_mb=args.shader_size)
+
+        bandwidth = args.bandwidth * 1024**2
+        servers = {
+            "principal": FakeCodeload(archive_path, args.latency, bandwidth, not args.no_ranges),
+            "instavel": FakeCodeload(archive_path, args.latency, bandwidth, not args.no_ranges, drop_after=1024**2),
+            "lento": FakeCodeload(archive_path, args.latency * 4, bandwidth / 4 or 2 * 1024**2, not args.no_ranges),
+        }
+
+        for server in servers.values():
+            server.serve_in_background()
+
+        urls = json.dumps({name: server.url for name, server in servers.items()})
+        results = []
+
+        try:
+            for mode in args.modes:
+                workdir = os.path.join(root, mode)
+                os.makedirs(workdir)
+
+                output = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_install"]
+                    + ["--run-mode", mode, "--urls", urls, "--workdir", workdir],
+                    check=True,
+                    capture_output=True,
+                    text=True,
+                    cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+        finally:
+            for server in servers.values():
+                server.shutdown()
+
+    print(format_report(results))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
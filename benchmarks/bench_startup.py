@@ -0,0 +1,115 @@
+"""Benchmark do tempo de inicialização, do processo novo até a primeira janela.
+
+Cada medida é um processo separado, então inclui a partida do interpretador (ou do
+bootloader do PyInstaller, com `--exe`). A janela é fechada assim que desenhada.
+
+    python -m benchmarks.bench_startup --repeat 10
+    python -m benchmarks.bench_startup --exe dist/modpack_updater/modpack_updater --exe dist/main
+    python -m benchmarks.bench_startup --importtime 15
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXIT_ON_SHOW = "MODPACK_UPDATER_EXIT_ON_SHOW"
+
+# O que é medido em cada alvo, a partir da raiz do projeto
+TARGETS = {
+    "python-vazio": [sys.executable, "-c", "pass"],
+    "importar-gui": [sys.executable, "-c", "import app.app"],
+    "importar-motor": [sys.executable, "-c", "import app.installer"],
+    "cli-ajuda": [sys.executable, "main.py", "--help"],
+    "janela": [sys.executable, "main.py"],
+}
+
+
+def measure(command, repeat, timeout=60):
+    """Executa `command` `repeat` vezes e retorna os tempos de parede, ou None se falhar."""
+    env = {**os.environ, EXIT_ON_SHOW: "1"}
+    times = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+
+        try:
+            result = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, timeout=timeout)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+
+        if result.returncode != 0:
+            return None
+
+        times.append(time.perf_counter() - started)
+
+    return times
+
+
+def import_profile(module, top):
+    """Retorna os `top` módulos com maior tempo cumulativo de importação de `module`."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+
+        own, cumulative, name = [part.strip() for part in line.split(":", 1)[1].split("|")]
+        rows.append((int(cumulative), int(own), name))
+
+    return sorted(rows, reverse=True)[:top]
+
+
+def format_report(results):
+    header = f"{'alvo':<40}{'mín':>9}{'mediana':>9}{'máx':>9}"
+    lines = [header, "-" * len(header)]
+
+    for name, times in results.items():
+        if times is None:
+            lines.append(f"{name:<40}{'indisponível':>27}")
+        else:
+            lines.append(
+                f"{name:<40}{min(times) * 1000:>7.0f}ms{statistics.median(times) * 1000:>7.0f}ms"
+                f"{max(times) * 1000:>7.0f}ms"
+            )
+
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo até a primeira janela do instalador.")
+    parser.add_argument("--targets", nargs="+", choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument("--exe", action="append", default=[], help="executável gerado pelo PyInstaller")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções por alvo")
+    parser.add_argument("--importtime", type=int, metavar="N", help="lista os N imports mais caros da interface")
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    commands = {name: TARGETS[name] for name in args.targets}
+    commands.update({os.path.relpath(os.path.abspath(exe), ROOT): [os.path.abspath(exe)] for exe in args.exe})
+
+    results = {name: measure(command, args.repeat) for name, command in commands.items()}
+    print(format_report(results))
+
+    if args.importtime:
+        print(f"\n{'cumulativo':>12}{'próprio':>10}  módulo")
+
+        for cumulative, own, name in import_profile("app.app", args.importtime):
+            print(f"{cumulative / 1000:>10.1f}ms{own / 1000:>8.1f}ms  {name}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""Servidor HTTP local que imita o codeload do GitHub para os benchmarks.
+
+Serve um ZIP sintético de modpack com `ETag`, requisições condicionais e faixas de
+bytes, com latência e limite de banda opcionais por conexão. Com `drop_after`, cada
+resposta é cortada depois desse número de bytes, imitando um espelho instável. Com
+`redirect`, toda requisição é redirecionada para essa URL (como os assets de uma
+release), e com `status` ela é respondida com esse código, sem o arquivo.
+
+    python -m benchmarks.fake_codeload --size 350 --entries 300 --latency 0.05 --bandwidth 20
+"""
+
+import os
+import time
+import random
+import hashlib
+import zipfile
+import argparse
+import threading
+import http.server
+
+ROOT = "minecraft_ultimaesperanca_modpack-master"
+CHUNK_SIZE = 64 * 1024
+
+
+def make_modpack(path, size_mb=50, entries=200, compressible=0.3, seed=0, shader_mb=0):
+    """Gera em `path` um ZIP com a mesma estrutura do modpack real e retorna seu tamanho.
+
+    Com `shader_mb`, inclui um shaderpack desse tamanho, para medir instalações sem shader.
+    """
+    rng = random.Random(seed)
+    entry_size = max(int(size_mb * 1024**2 / max(entries, 1)), 1)
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for directory in ("", "mods/", "config/", "shaderpacks/"):
+            zip_file.writestr(f"{ROOT}/{directory}", "")
+
+        zip_file.writestr(f"{ROOT}/options.txt", "fullscreen:true\nrenderDistance:16\nsimulationDistance:16\n")
+        zip_file.writestr(f"{ROOT}/config/oculus.properties", "enableShaders=true\nmaxShadowRenderDistance=32\n")
+
+        for index in range(entries):
+            # Jars são quase incompressíveis; uma fração de texto imita configs e recursos
+            text = int(entry_size * compressible)
+            data = rng.randbytes(entry_size - text) + b"modpack " * (text // 8)
+            zip_file.writestr(f"{ROOT}/mods/mod_{index:04d}.jar", data)
+
+        if shader_mb:
+            data = rng.randbytes(int(shader_mb * 1024**2))
+            zip_file.writestr(f"{ROOT}/shaderpacks/ComplementaryUnbound_r5.3.zip", data)
+
+    return os.path.getsize(path)
+
+
+class FakeCodeload(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        archive_path,
+        latency=0.0,
+        bandwidth=0.0,
+        ranges=True,
+        address=("127.0.0.1", 0),
+        drop_after=0,
+        redirect=None,
+        status=0,
+    ):
+        super().__init__(address, FakeCodeloadHandler)
+        self.archive_path = archive_path
+        self.latency = latency
+        # Limite por conexão, em bytes por segundo (0 desliga)
+        self.bandwidth = bandwidth
+        self.ranges = ranges
+        self.drop_after = drop_after
+        self.redirect = redirect
+        self.status = status
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        digest = hashlib.sha256()
+
+        with open(self.archive_path, "rb") as file:
+            while chunk := file.read(1024**2):
+                digest.update(chunk)
+
+        self.size = os.path.getsize(self.archive_path)
+        self.etag = f'"{digest.hexdigest()[:16]}"'
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/devleonardoamaral/minecraft_ultimaesperanca_modpack/zip/refs/heads/master"
+
+    def serve_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+
+class FakeCodeloadHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        server = self.server
+
+        with server.lock:
+            server.requests += 1
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        if server.redirect or server.status:
+            self.send_response(302 if server.redirect else server.status)
+            if server.redirect:
+                self.send_header("Location", server.redirect)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.send_header("ETag", server.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start, end = 0, server.size - 1
+        range_header = self.headers.get("Range")
+        if_range = self.headers.get("If-Range")
+
+        if server.ranges and range_header and if_range in (None, server.etag):
+            first, _, last = range_header.removeprefix("bytes=").partition("-")
+            start = int(first)
+            end = min(int(last), server.size - 1) if last else server.size - 1
+
+            if start >= server.size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{server.size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{server.size}")
+        else:
+            self.send_response(200)
+
+        self.send_header("ETag", server.etag)
+        self.send_header("Accept-Ranges", "bytes" if server.ranges else "none")
+        self.send_header("Content-Type", "application/zip")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        if send_body:
+            self.send_file(start, end)
+
+    def send_file(self, start, end):
+        server = self.server
+        remaining = end - start + 1
+        started = time.monotonic()
+        sent = 0
+
+        with open(server.archive_path, "rb") as file:
+            file.seek(start)
+
+            while remaining > 0:
+                chunk = file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+
+                if server.drop_after and sent + len(chunk) > server.drop_after:
+                    # Corta a conexão no meio da resposta
+                    part = chunk[: max(server.drop_after - sent, 0)]
+                    self.wfile.write(part)
+                    sent += len(part)
+                    self.close_connection = True
+                    break
+
+                try:
+                    self.wfile.write(chunk)
+                except (BrokenPipeError, ConnectionResetError):
+                    return
+
+                remaining -= len(chunk)
+                sent += len(chunk)
+
+                if server.bandwidth:
+                    # Espera até que a taxa média volte ao limite configurado
+                    delay = sent / server.bandwidth - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+
+        with server.lock:
+            server.bytes_sent += sent
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que imita o codeload do GitHub.")
+    parser.add_argument("--size", type=float, default=50, help="tamanho aproximado do modpack em MB")
+    parser.add_argument("--entries", type=int, default=200, help="quantidade de mods no ZIP")
+    parser.add_argument("--shader-size", type=float, default=0.0, help="tamanho do shaderpack em MB")
+    parser.add_argument("--latency", type=float, default=0.0, help="latência por requisição em segundos")
+    parser.add_argument("--bandwidth", type=float, default=0.0, help="limite por conexão em MB/s")
+    parser.add_argument("--no-ranges", action="store_true", help="desliga o suporte a faixas de bytes")
+    parser.add_argument("--drop-after", type=float, default=0.0, help="corta cada resposta depois de N MB")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--archive", default="fake_modpack.zip", help="onde gerar o ZIP sintético")
+    args = parser.parse_args(argv)
+
+    make_modpack(args.archive, args.size, args.entries, shader_mb=args.shader_size)
+    server = FakeCodeload(
+        args.archive,
+        args.latency,
+        args.bandwidth * 1024**2,
+        not args.no_ranges,
+        ("127.0.0.1", args.port),
+        int(args.drop_after * 1024**2),
+    )
+    print(f"Servindo {args.archive} ({server.size / 1024**2:.1f} MB) em {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
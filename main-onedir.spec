@@ -0,0 +1,53 @@
+# -*- mode: python ; coding: utf-8 -*-
+# Build em pasta (one-dir): sem extrair tudo para um diretório temporário a cada
+# execução, a janela abre bem mais rápido do que no executável único de main.spec.
+#
+#   pyinstaller main-onedir.spec
+#   python -m benchmarks.bench_startup --exe dist/modpack_updater/modpack_updater
+
+
+a = Analysis(
+    ['main.py'],
+    pathex=[],
+    binaries=[],
+    datas=[('app/assets/*', 'app/assets')],
+    hiddenimports=[],
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    # Só usados pelos benchmarks e pelas ferramentas de desenvolvimento
+    excludes=['benchmarks', 'unittest', 'pydoc', 'doctest'],
+    noarchive=False,
+    optimize=0,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='modpack_updater',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    # Bibliotecas comprimidas com UPX teriam de ser descomprimidas a cada execução
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=['app/assets/icon.ico'],
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='modpack_updater',
+)
@@ -1,11 +1,26 @@
+import os
 import sys
 
+# Usado pelo benchmark de inicialização: fecha a janela assim que ela é desenhada
+EXIT_ON_SHOW = "MODPACK_UPDATER_EXIT_ON_SHOW"
+
 
 def main(argv):
+    # Com argumentos roda sem interface gráfica, sem importar o Tk
+    if len(argv) > 1:
+        from app.cli import main as cli_main
+
+        return cli_main(argv[1:])
+
     from app.app import App
 
-    App.get_instance().root.mainloop()
+    app = App.get_instance()
+
+    if os.environ.get(EXIT_ON_SHOW):
+        app.root.after_idle(lambda: app.root.after(0, app.root.destroy))
+
+    app.root.mainloop()
 
 
 if __name__ == "__main__":
-    main(sys.argv)
+    sys.exit(main(sys.argv))
@@ -0,0 +1,108 @@
+import json
+import random
+import zipfile
+import pytest
+from app.extract import extract_archive
+from app.manifest import Manifest
+from app.patch import PATCH_FORMAT, PATCH_HEADER, PatchUnavailable, apply_patch, make_patch
+
+ROOT = "modpack-master"
+
+
+def make_zip(path, files):
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        for name, data in files.items():
+            zip_file.writestr(f"{ROOT}/{name}", data)
+
+    return path
+
+
+def install(archive_path, dest_dir):
+    manifest = Manifest(str(dest_dir))
+    extract_archive(str(archive_path), manifest)
+    return manifest
+
+
+@pytest.fixture
+def revisions(tmp_path):
+    """Duas revisões do modpack: um mod grande com um trecho inserido no meio, um alterado, um novo e um removido."""
+    data = random.Random(0).randbytes(300 * 1024)
+    old = {
+        "mods/big.jar": data,
+        "mods/removed.jar": b"removido",
+        "options.txt": b"renderDistance:8\n",
+    }
+    new = {
+        "mods/big.jar": data[: len(data) // 2] + b"trecho novo\n" * 50 + data[len(data) // 2 :],
+        "mods/added.jar": b"adicionado",
+        "options.txt": b"renderDistance:16\n",
+    }
+    return make_zip(tmp_path / "old.zip", old), make_zip(tmp_path / "new.zip", new), new
+
+
+def test_round_trip_uses_a_delta_for_an_insertion(tmp_path, revisions):
+    old_zip, new_zip, new = revisions
+    patch_path = tmp_path / "a-b.zip"
+    entry = make_patch(str(old_zip), str(new_zip), str(patch_path), "a", "b")
+
+    with zipfile.ZipFile(patch_path) as patch:
+        header = json.loads(patch.read(PATCH_HEADER))
+        big = header["files"]["mods/big.jar"]
+        payload_size = patch.getinfo(big["payload"]).file_size
+
+    assert "source" in big
+    assert payload_size < 10 * 1024
+    assert header["deleted"] == ["mods/removed.jar"]
+    assert entry["from"] == "a" and entry["to"] == "b"
+
+    dest_dir = tmp_path / "mc"
+    manifest = install(old_zip, dest_dir)
+
+    assert apply_patch(str(patch_path), manifest) == "b"
+    assert set(manifest.files) == set(new)
+    assert not (dest_dir / "mods" / "removed.jar").exists()
+
+    for name, data in new.items():
+        assert (dest_dir / name).read_bytes() == data
+        assert manifest.is_current(name, manifest.files[name]["crc"], len(data))
+
+
+def test_source_mismatch_raises_before_writing(tmp_path, revisions):
+    old_zip, new_zip, _ = revisions
+    patch_path = tmp_path / "a-b.zip"
+    make_patch(str(old_zip), str(new_zip), str(patch_path), "a", "b")
+
+    dest_dir = tmp_path / "mc"
+    manifest = install(old_zip, dest_dir)
+    manifest.files["mods/big.jar"]["sha256"] = "0" * 64
+
+    with pytest.raises(PatchUnavailable):
+        apply_patch(str(patch_path), manifest)
+
+    assert (dest_dir / "options.txt").read_bytes() == b"renderDistance:8\n"
+    assert not (dest_dir / "mods" / "added.jar").exists()
+
+
+@pytest.mark.parametrize("name", ["../evil.txt", "mods/../../evil.txt", "/tmp/evil.txt", "C:/evil.txt"])
+@pytest.mark.parametrize("field", ["files", "deleted"])
+def test_unsafe_names_are_rejected(tmp_path, revisions, name, field):
+    old_zip, _, _ = revisions
+    dest_dir = tmp_path / "mc" / "dest"
+    manifest = install(old_zip, dest_dir)
+    (tmp_path / "mc" / "evil.txt").write_bytes(b"fora do destino")
+
+    header = {"format": PATCH_FORMAT, "from": "a", "to": "b", "files": {}, "deleted": []}
+    if field == "files":
+        header["files"][name] = {"crc": 0, "size": 4, "sha256": "0" * 64, "payload": "files/00000"}
+    else:
+        header["deleted"].append(name)
+
+    patch_path = tmp_path / "evil.zip"
+    with zipfile.ZipFile(patch_path, "w") as patch:
+        patch.writestr("files/00000", b"evil")
+        patch.writestr(PATCH_HEADER, json.dumps(header))
+
+    with pytest.raises(ValueError, match="Caminho inseguro"):
+        apply_patch(str(patch_path), manifest)
+
+    assert (tmp_path / "mc" / "evil.txt").read_bytes() == b"fora do destino"
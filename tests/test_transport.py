@@ -0,0 +1,121 @@
+import time
+import asyncio
+import pytest
+from app.cache import ArchiveCache
+from app.transport import MirroredDownload, MirrorSet
+from benchmarks.fake_codeload import FakeCodeload, make_modpack
+
+
+@pytest.fixture
+def archive(tmp_path):
+    path = tmp_path / "modpack.zip"
+    make_modpack(str(path), size_mb=1, entries=10)
+    return path
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(*args, **kwargs):
+        server = FakeCodeload(*args, **kwargs)
+        server.serve_in_background()
+        servers.append(server)
+        return server
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def download(tmp_path, mirrors, connections=1):
+    """Baixa dos `mirrors` para o cache em `tmp_path` e retorna o conteúdo recebido."""
+    cache = ArchiveCache(str(tmp_path / "cache"))
+
+    with cache.open_writer("modpack") as temp:
+        response = asyncio.run(MirroredDownload(mirrors, temp, connections).run())
+        assert response.status in (200, 206)
+
+    with open(temp.temp_path, "rb") as file:
+        return file.read()
+
+
+def bytes_sent(server, expected):
+    """Espera o servidor contabilizar `expected` bytes: ele só soma ao terminar cada resposta."""
+    deadline = time.monotonic() + 2
+
+    while server.bytes_sent < expected and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    return server.bytes_sent
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_failover_from_a_mirror_that_drops(tmp_path, serve, connections):
+    # Grande o bastante para o download segmentado
+    archive = tmp_path / "large.zip"
+    make_modpack(str(archive), size_mb=14, entries=10)
+    unstable = serve(str(archive), drop_after=256 * 1024)
+    # Com a latência maior, o estável fica atrás do instável na comparação do HEAD
+    stable = serve(str(archive), latency=0.05)
+    mirrors = MirrorSet([unstable.url, stable.url])
+
+    assert download(tmp_path, mirrors, connections) == archive.read_bytes()
+    assert mirrors.mirrors[0].failures > 0
+    assert bytes_sent(stable, 1) > 0
+
+
+@pytest.mark.parametrize("connections", [1, 4])
+def test_redirect_is_followed(tmp_path, archive, serve, connections):
+    target = serve(str(archive))
+    mirror = serve(str(archive), redirect=target.url)
+
+    assert download(tmp_path, MirrorSet([mirror.url]), connections) == archive.read_bytes()
+    assert bytes_sent(target, archive.stat().st_size) == archive.stat().st_size
+
+
+def test_redirect_loop_fails(tmp_path, archive, serve):
+    mirror = serve(str(archive))
+    mirror.redirect = mirror.url
+
+    with pytest.raises(ConnectionError):
+        download(tmp_path, MirrorSet([mirror.url]))
+
+
+@pytest.mark.parametrize("status", [204, 300, 503])
+def test_unexpected_status_moves_to_the_next_mirror(tmp_path, archive, serve, status):
+    broken = serve(str(archive), status=status)
+    working = serve(str(archive))
+    mirrors = MirrorSet([broken.url, working.url])
+
+    assert download(tmp_path, mirrors) == archive.read_bytes()
+    assert mirrors.mirrors[0].failures > 0
+    assert bytes_sent(working, archive.stat().st_size) == archive.stat().st_size
+
+
+def test_ranking_follows_recorded_throughput(tmp_path, serve):
+    archive = tmp_path / "small.zip"
+    make_modpack(str(archive), size_mb=0.25, entries=4)
+    size = archive.stat().st_size
+    slow = serve(str(archive), bandwidth=256 * 1024)
+    fast = serve(str(archive))
+    stats_path = str(tmp_path / "mirrors.json")
+
+    download(tmp_path / "first", MirrorSet([slow.url], stats_path))
+    assert bytes_sent(slow, size) == size
+
+    # Medido, o espelho lento fica atrás de um ainda sem medidas
+    mirrors = MirrorSet([slow.url, fast.url], stats_path)
+    assert mirrors.mirrors[0].throughput is not None
+    assert [mirror.url for mirror in mirrors.ranked()] == [fast.url, slow.url]
+
+    download(tmp_path / "second", mirrors)
+    assert bytes_sent(fast, size) == size
+    assert bytes_sent(slow, size) == size
+
+    # As medidas gravadas deixam o rápido na frente na próxima execução
+    mirrors = MirrorSet([slow.url, fast.url], stats_path)
+    assert mirrors.mirrors[1].throughput > mirrors.mirrors[0].throughput
+    assert [mirror.url for mirror in mirrors.ranked()] == [fast.url, slow.url]